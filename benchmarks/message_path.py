@@ -0,0 +1,287 @@
+"""
+Microbenchmarks for the message hot path and the collection helpers.
+
+Run from the repository root:
+
+    python -m benchmarks.message_path
+    python -m benchmarks.message_path --backend sqlite
+    python -m benchmarks.message_path --backend mongo --uri mongodb://localhost:27017
+
+The in-memory storage backend is used by default, so no server is needed. Each
+run is appended to `benchmarks/results.jsonl` and compared with the previous
+run on the same backend.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+from database import MongoDB
+
+RESULTS_PATH = "./benchmarks/results.jsonl"
+
+OPERATIONS = [
+    "insert_one",
+    "get_all",
+    "find_one",
+    "delete_one",
+    "update_one",
+    "find_one_and_update",
+    "increment_many",
+]
+
+
+class OpCounter:
+    """Counts calls made through the database wrapper."""
+
+    def __init__(self, db: Any):
+        self.counts: Dict[str, int] = {operation: 0 for operation in OPERATIONS}
+
+        for operation in OPERATIONS:
+            setattr(db, operation, self._wrap(operation, getattr(db, operation)))
+
+    def _wrap(self, operation: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def counted(*args, **kwargs):
+            self.counts[operation] += 1
+            return fn(*args, **kwargs)
+
+        return counted
+
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def reset(self) -> None:
+        for operation in self.counts:
+            self.counts[operation] = 0
+
+
+def setup_database(backend: str, uri: Optional[str], path: str) -> Any:
+    """Points the collection modules at a scratch database on `backend`, before any of them load it."""
+    settings.use(
+        {
+            "token": "",
+            "guild_id": "",
+            "database": uri or "",
+            "storage": {"backend": backend, "path": path},
+        }
+    )
+
+    from storage import backends
+
+    if backend == "mongo":
+        # the collection modules ask for "community", point them at a scratch database instead
+        db = MongoDB(uri, "community_bench")
+        db.client.drop_database("community_bench")
+        backends._opened[("mongo", "community")] = db
+    elif backend == "sqlite" and os.path.exists(path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    from dtypes.collections.indexes import ensure_indexes
+
+    ensure_indexes()
+    return backends.open_storage("community")
+
+
+def synthetic_message(user_id: int) -> SimpleNamespace:
+    """The parts of a `discord.Message` that `on_message` reads."""
+    return SimpleNamespace(
+        author=SimpleNamespace(
+            id=user_id,
+            bot=False,
+            name=f"user{user_id}",
+            global_name=f"User {user_id}",
+        )
+    )
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def summarise(samples: List[float], elapsed: float, ops: int) -> Dict[str, float]:
+    return {
+        "calls": len(samples),
+        "per_sec": len(samples) / elapsed if elapsed else 0.0,
+        "db_ops_per_call": ops / len(samples) if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+async def bench_on_message(counter: OpCounter, users: int, messages: int, rate: float, seed: int) -> Dict[str, float]:
+    """
+    Drives `messages` messages through the path `on_message` takes, on a
+    simulated clock running at `rate` messages per second. The XP limiter and
+    the periodic XP flush follow that clock with their configured settings,
+    so the run sees the same limiting and cache churn a guild would.
+    """
+    from main import HyperLands
+
+    bot = HyperLands(shard_count=1)
+    rng = random.Random(seed)
+
+    # a few chatty users and a long tail, roughly like a real guild
+    population = list(range(10**17, 10**17 + users))
+    weights = [1 / (rank + 1) for rank in range(users)]
+    authors = rng.choices(population, weights=weights, k=messages)
+
+    counter.reset()
+    samples = []
+    next_flush = bot.xp.flush_interval
+    started = time.perf_counter()
+
+    for i, author in enumerate(authors):
+        now = i / rate
+        if now >= next_flush:
+            # the flush loop runs beside message handling, so it counts towards db ops but not latency
+            await bot.xp.flush()
+            next_flush += bot.xp.flush_interval
+
+        if not bot.xp_limiter.allow(author, now=now):
+            continue
+
+        # on_message only queues the message, this is the work an ingest worker does
+        call_started = time.perf_counter()
+        await bot.handle_message(synthetic_message(author))
+        samples.append(time.perf_counter() - call_started)
+
+    await bot.xp.flush()
+    elapsed = time.perf_counter() - started
+
+    result = summarise(samples, elapsed, counter.total())
+    result["limited"] = messages - len(samples)
+    result["db_ops_per_message"] = counter.total() / messages if messages else 0.0
+    result["cache_hit_ratio"] = bot.cached_profiles.hit_ratio
+    return result
+
+
+def bench_helper(counter: OpCounter, fn: Callable[[int], Any], iterations: int) -> Dict[str, float]:
+    counter.reset()
+    samples = []
+    started = time.perf_counter()
+
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - call_started)
+
+    return summarise(samples, time.perf_counter() - started, counter.total())
+
+
+def bench_helpers(counter: OpCounter, users: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    from dtypes.collections.colors import get_colors, save as save_color
+    from dtypes.collections.profile import find_profile_by_id, update_profile_by_id
+
+    for i in range(20):
+        save_color({"name": f"Color {i}", "value": f"#{i:06x}", "author": "bench"})
+
+    def user_id(i: int) -> str:
+        return str(10**17 + i % users)
+
+    return {
+        "find_profile_by_id": bench_helper(counter, lambda i: find_profile_by_id(user_id(i)), iterations),
+        "update_profile_by_id": bench_helper(
+            counter, lambda i: update_profile_by_id(user_id(i), "nickname", f"bench {i}"), iterations
+        ),
+        "get_colors": bench_helper(counter, lambda i: get_colors(), iterations),
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_run(backend: str) -> Optional[Dict[str, Any]]:
+    previous = None
+    try:
+        with open(RESULTS_PATH, "r") as f:
+            for line in f:
+                run = json.loads(line)
+                if run.get("backend") == backend:
+                    previous = run
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def report(run: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    print(
+        f"bench - {run['backend']} @ {run['commit']}, {run['users']} users, "
+        f"{run['messages']} messages at {run.get('rate', 0):.0f}/s"
+    )
+    on_message = run["on_message"]
+    print(
+        f"  {on_message.get('limited', 0)} messages rate limited, "
+        f"{on_message.get('db_ops_per_message', on_message['db_ops_per_call']):.3f} db ops/message, "
+        f"cache hit ratio {on_message['cache_hit_ratio']:.3f}"
+    )
+
+    for name, result in [("on_message", run["on_message"]), *run["helpers"].items()]:
+        line = (
+            f"  {name:<22} {result['per_sec']:>10.0f}/s  "
+            f"p50 {result['p50_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms  "
+            f"{result['db_ops_per_call']:.3f} db ops/call"
+        )
+
+        if previous is not None:
+            before = previous["on_message"] if name == "on_message" else previous["helpers"].get(name)
+            if before and before["per_sec"]:
+                change = (result["per_sec"] - before["per_sec"]) / before["per_sec"] * 100
+                line += f"  ({change:+.1f}% vs {previous['commit']})"
+
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "sqlite", "mongo"], default="memory")
+    parser.add_argument("--uri", help="mongod to run against, for --backend mongo")
+    parser.add_argument("--path", default="./benchmarks/bench.sqlite3", help="scratch file for --backend sqlite")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--rate", type=float, default=50.0, help="simulated messages per second")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per collection helper")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the results file")
+    args = parser.parse_args()
+    if args.backend == "mongo" and not args.uri:
+        parser.error("--backend mongo needs --uri")
+
+    db = setup_database(args.backend, args.uri, args.path)
+    counter = OpCounter(db)
+
+    run = {
+        "commit": current_commit(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "backend": args.backend,
+        "users": args.users,
+        "messages": args.messages,
+        "rate": args.rate,
+        "on_message": asyncio.run(bench_on_message(counter, args.users, args.messages, args.rate, args.seed)),
+        "helpers": bench_helpers(counter, args.users, args.iterations),
+    }
+
+    report(run, previous_run(run["backend"]))
+
+    if not args.no_save:
+        with open(RESULTS_PATH, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+
+if __name__ == "__main__":
+    main()
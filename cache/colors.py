@@ -0,0 +1,82 @@
+from typing import AbstractSet, Dict, Iterator, List, Optional
+
+import discord
+
+from dtypes.collections.colors import ProfileColors, get_colors_async
+
+
+class CatalogColor:
+    """A color document with its lookup key and parsed value precomputed."""
+
+    __slots__ = ("name", "lower", "value", "color", "author", "role_id")
+
+    def __init__(self, document: ProfileColors):
+        self.name: str = document.get("name")
+        self.lower: str = self.name.lower()
+        self.value: str = document.get("value")
+        self.author = document.get("author")
+        self.role_id: Optional[int] = document.get("role_id")
+
+        try:
+            self.color: Optional[discord.Color] = discord.Color.from_str(self.value)
+        except (TypeError, ValueError):
+            self.color = None
+
+
+class ColorCatalog:
+    """
+    Process-wide, in-memory copy of the `colors` collection.
+
+    It is loaded once at startup and only refreshed when a color is added or
+    removed, so lookups and autocomplete never touch the database.
+    """
+
+    def __init__(self):
+        self._colors: Dict[str, CatalogColor] = {}
+        self._roles: Dict[int, CatalogColor] = {}
+
+    async def refresh(self) -> None:
+        """Reloads the catalog from the database."""
+        self.load(await get_colors_async())
+
+    def load(self, documents: List[ProfileColors]) -> None:
+        """Replaces the catalog with `documents`."""
+        self._colors = {
+            entry.lower: entry for entry in (CatalogColor(document) for document in documents)
+        }
+        self._roles = {entry.role_id: entry for entry in self._colors.values() if entry.role_id is not None}
+
+    def find(self, name: str) -> Optional[CatalogColor]:
+        return self._colors.get(name.strip().lower())
+
+    def find_by_role(self, role_id: int) -> Optional[CatalogColor]:
+        return self._roles.get(role_id)
+
+    def role_ids(self) -> AbstractSet[int]:
+        """Ids of every color's role."""
+        return self._roles.keys()
+
+    def search(self, current: str, limit: int = 25) -> List[CatalogColor]:
+        """Colors whose name contains `current`, capped at `limit`."""
+        current = current.strip().lower()
+        matches = []
+
+        for entry in self._colors.values():
+            if current in entry.lower:
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+
+        return matches
+
+    def __contains__(self, name: str) -> bool:
+        return name.strip().lower() in self._colors
+
+    def __iter__(self) -> Iterator[CatalogColor]:
+        return iter(self._colors.values())
+
+    def __len__(self) -> int:
+        return len(self._colors)
+
+
+color_catalog = ColorCatalog()
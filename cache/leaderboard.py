@@ -0,0 +1,75 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dtypes.collections.profile import get_levels_async
+
+
+class Leaderboard:
+    """
+    Profiles ranked by level, kept sorted in memory.
+
+    It is loaded once at startup and then updated as XP is flushed, so rank
+    lookups and pages never need a sort on the collection.
+    """
+
+    def __init__(self):
+        self._levels: Dict[str, int] = {}
+        # (-level, user_id), so the best level comes first and ties are stable
+        self._ranked: List[Tuple[int, str]] = []
+
+    async def refresh(self) -> None:
+        """Reloads every profile's level from the database."""
+        profiles = await get_levels_async()
+        self.load(
+            (profile["user_id"], profile["level"])
+            for profile in profiles
+            if isinstance(profile.get("level"), int)
+        )
+
+    def load(self, entries: Iterable[Tuple[str, int]]) -> None:
+        self._levels = {str(user_id): level for user_id, level in entries}
+        self._ranked = sorted((-level, user_id) for user_id, level in self._levels.items())
+
+    def set(self, user_id: str, level: int) -> None:
+        user_id = str(user_id)
+        old = self._levels.get(user_id)
+
+        if old == level:
+            return
+
+        if old is not None:
+            del self._ranked[bisect_left(self._ranked, (-old, user_id))]
+
+        self._levels[user_id] = level
+        insort(self._ranked, (-level, user_id))
+
+    def add(self, user_id: str, amount: int, cap: Optional[int] = None) -> None:
+        """Mirrors a server-side XP increment."""
+        level = self._levels.get(str(user_id), 0) + amount
+        self.set(user_id, level if cap is None else min(level, cap))
+
+    def remove(self, user_id: str) -> None:
+        old = self._levels.pop(str(user_id), None)
+        if old is not None:
+            del self._ranked[bisect_left(self._ranked, (-old, str(user_id)))]
+
+    def level(self, user_id: str) -> Optional[int]:
+        return self._levels.get(str(user_id))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank of `user_id`, or None if they aren't ranked."""
+        level = self._levels.get(str(user_id))
+        if level is None:
+            return None
+
+        return bisect_left(self._ranked, (-level, str(user_id))) + 1
+
+    def top(self, count: int = 10, offset: int = 0) -> List[Tuple[str, int]]:
+        """A page of `(user_id, level)` pairs, best first."""
+        return [(user_id, -level) for level, user_id in self._ranked[offset : offset + count]]
+
+    def __len__(self) -> int:
+        return len(self._ranked)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,174 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from services.metrics import registry
+
+
+class ProfileCache:
+    """
+    Bounded, keyed cache for community profiles (`ProfileRecord`s).
+
+    Entries are keyed by `user_id` and evicted least-recently-used first once
+    `max_size` is reached, or lazily on access once they are older than `ttl`
+    seconds.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        # told about local writes, so other processes can drop their copies
+        self.listeners: List[Callable[[str], None]] = []
+
+    def _notify(self, key: str) -> None:
+        for listener in self.listeners:
+            listener(key)
+
+    def get(self, user_id: Any) -> Optional[Any]:
+        """Returns the cached profile for `user_id`, or None on a miss."""
+        key = str(user_id)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, profile = entry
+        if expires_at <= time.monotonic():
+            # stale, drop it and let the caller go to the database
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return profile
+
+    def put(self, user_id: Any, profile: Any) -> None:
+        """Caches `profile` under `user_id`, evicting the oldest entries if full."""
+        key = str(user_id)
+
+        self._entries[key] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def configure(self, max_size: int, ttl: float) -> None:
+        """Applies new limits, evicting straight away if the cache shrank."""
+        self.max_size = max_size
+        self.ttl = ttl
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def patch(self, user_id: Any, k: str, v: Any) -> None:
+        """Applies a single field update to a cached profile, if it is cached."""
+        self._notify(str(user_id))
+
+        entry = self._entries.get(str(user_id))
+        if entry is None:
+            return
+
+        try:
+            setattr(entry[1], k, v)
+        except AttributeError:
+            # not a field the record keeps, so the cached copy can't be trusted
+            self.invalidate(user_id, broadcast=False)
+
+    def add_level(self, user_id: Any, amount: int, cap: int) -> bool:
+        """
+        Mirrors a capped server-side XP increment on a cached profile, so a
+        flush doesn't turn the next message into a miss. Returns True if the
+        profile was cached and numeric; anything else is left as it is, like
+        the server leaves it.
+        """
+        entry = self._entries.get(str(user_id))
+        if entry is None:
+            return False
+
+        profile = entry[1]
+        level = getattr(profile, "level", None)
+        if not isinstance(level, (int, float)) or isinstance(level, bool):
+            return False
+
+        profile.level = min(level + amount, cap)
+        return True
+
+    def invalidate(self, user_id: Any, broadcast: bool = True) -> bool:
+        """
+        Drops `user_id` from the cache. Returns True if it was cached.
+        Listeners are told unless `broadcast` is False.
+        """
+        if broadcast:
+            self._notify(str(user_id))
+
+        return self._entries.pop(str(user_id), None) is not None
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Every live entry as (user_id, profile), oldest first. Doesn't count as lookups."""
+        now = time.monotonic()
+        return [(key, profile) for key, (expires_at, profile) in self._entries.items() if expires_at > now]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hit_ratio,
+        }
+
+    def __contains__(self, user_id: Any) -> bool:
+        return str(user_id) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# process-wide cache shared by the bot, the cogs and the collection helpers
+profile_cache = ProfileCache(
+    max_size=settings.get_int("cache.profile_max_size", 10_000),
+    ttl=settings.get_float("cache.profile_ttl", 300.0),
+)
+
+
+def _on_config_change(changed: Set[str]) -> None:
+    if "cache" in changed:
+        profile_cache.configure(
+            max_size=settings.get_int("cache.profile_max_size", 10_000),
+            ttl=settings.get_float("cache.profile_ttl", 300.0),
+        )
+
+
+settings.subscribe(_on_config_change)
+
+
+def _stats(key: str):
+    return lambda: [({"cache": "profiles"}, profile_cache.stats()[key])]
+
+
+registry.gauge("hyperlands_cache_entries", "Entries currently cached.", _stats("size"))
+registry.gauge("hyperlands_cache_hits", "Cache lookups that found an entry.", _stats("hits"))
+registry.gauge("hyperlands_cache_misses", "Cache lookups that missed.", _stats("misses"))
+registry.gauge("hyperlands_cache_hit_ratio", "Share of cache lookups that hit.", _stats("hit_ratio"))
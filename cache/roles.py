@@ -0,0 +1,56 @@
+from typing import Dict, Optional
+
+import discord
+
+from cache.colors import CatalogColor
+
+
+class RoleIndex:
+    """
+    Per-guild lookup from role name to role id.
+
+    Loaded when a guild becomes available and kept current from the
+    `on_guild_role_*` events, so resolving a color's role never scans
+    `guild.roles`. Roles themselves are fetched by id with `guild.get_role`.
+    """
+
+    def __init__(self):
+        self._names: Dict[int, Dict[str, int]] = {}
+
+    def load(self, guild: discord.Guild) -> None:
+        self._names[guild.id] = {role.name.strip().lower(): role.id for role in guild.roles}
+
+    def forget(self, guild: discord.Guild) -> None:
+        self._names.pop(guild.id, None)
+
+    def add(self, role: discord.Role) -> None:
+        self._names.setdefault(role.guild.id, {})[role.name.strip().lower()] = role.id
+
+    def remove(self, role: discord.Role) -> None:
+        names = self._names.get(role.guild.id, {})
+        name = role.name.strip().lower()
+
+        # a newer role may have taken the name since
+        if names.get(name) == role.id:
+            del names[name]
+
+    def update(self, before: discord.Role, after: discord.Role) -> None:
+        self.remove(before)
+        self.add(after)
+
+    def find(self, guild: discord.Guild, name: str) -> Optional[discord.Role]:
+        """The role in `guild` named exactly `name`, ignoring case."""
+        role_id = self._names.get(guild.id, {}).get(name.strip().lower())
+        return guild.get_role(role_id) if role_id is not None else None
+
+    def resolve(self, guild: discord.Guild, color: CatalogColor) -> Optional[discord.Role]:
+        """The role backing `color`. Colors saved before role ids were stored fall back to the name."""
+        if color.role_id is not None:
+            role = guild.get_role(color.role_id)
+            if role is not None:
+                return role
+
+        return self.find(guild, color.name)
+
+
+role_index = RoleIndex()
@@ -0,0 +1,146 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set
+
+import discord
+
+from dtypes.collections.rules import Rules, get_rules_async
+
+
+# Discord rejects embeds past these
+MAX_FIELDS = 25
+MAX_EMBED_LENGTH = 6000
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+
+# room left on each page for the "Page x/y" footer
+FOOTER_RESERVE = 32
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def render_pages(rules: List[Rules], title: str = "Community Rules") -> List[discord.Embed]:
+    """
+    Lays the rules out as embed fields over as many pages as needed to stay
+    within Discord's per-embed field and length limits.
+    """
+    pages: List[discord.Embed] = []
+    page: Optional[discord.Embed] = None
+
+    for rule in rules:
+        name = _clip(str(rule.get("title") or rule.get("name")), MAX_FIELD_NAME)
+        value = _clip(str(rule.get("description") or "-"), MAX_FIELD_VALUE)
+
+        if (
+            page is None
+            or len(page.fields) >= MAX_FIELDS
+            or len(page) + len(name) + len(value) > MAX_EMBED_LENGTH - FOOTER_RESERVE
+        ):
+            page = discord.Embed(title=title, color=discord.Color.blue())
+            pages.append(page)
+
+        page.add_field(name=name, value=value, inline=True)
+
+    for number, page in enumerate(pages, start=1):
+        page.set_footer(text=f"Page {number}/{len(pages)}")
+
+    return pages
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class RuleIndex:
+    """
+    In-memory copy of the `rules` collection with a search index over rule names.
+
+    Names are kept sorted for prefix lookups and broken into trigrams for
+    substring / fuzzy matches. The index is rebuilt whenever a rule is added
+    or removed, along with the embed pages `/rules` shows.
+    """
+
+    def __init__(self):
+        self._rules: Dict[str, Rules] = {}
+        self._names: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+        self.pages: List[discord.Embed] = []
+
+    async def refresh(self) -> None:
+        """Reloads the rules from the database and rebuilds the index."""
+        self._build(await get_rules_async())
+
+    def _build(self, rules: List[Rules]) -> None:
+        self._rules = {rule["name"].strip().lower(): rule for rule in rules}
+        self._names = sorted(self._rules)
+        self._trigrams = {}
+        self.pages = render_pages(list(self._rules.values()))
+
+        for name in self._names:
+            for trigram in _trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(name)
+
+    def find(self, name: str) -> Optional[Rules]:
+        return self._rules.get(name.strip().lower())
+
+    def all(self) -> List[Rules]:
+        return list(self._rules.values())
+
+    def search(self, current: str, limit: int = 25) -> List[str]:
+        """
+        Rule names matching `current`, best first: prefix matches, then
+        substring matches, then names sharing at least half of its trigrams.
+        """
+        current = current.strip().lower()
+        if not current:
+            return self._names[:limit]
+
+        results: List[str] = []
+        seen: Set[str] = set()
+
+        def take(names) -> bool:
+            for name in names:
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        # prefix matches are a contiguous run in the sorted names
+        start = bisect_left(self._names, current)
+        prefixed = []
+        for name in self._names[start:]:
+            if not name.startswith(current):
+                break
+            prefixed.append(name)
+
+        if take(sorted(prefixed, key=len)):
+            return results
+
+        query = _trigrams(current)
+        if not query:
+            # too short for trigrams, fall back to a plain substring check
+            take(name for name in self._names if current in name)
+            return results
+
+        overlap: Dict[str, int] = {}
+        for trigram in query:
+            for name in self._trigrams.get(trigram, ()):
+                overlap[name] = overlap.get(name, 0) + 1
+
+        substrings = [name for name in overlap if current in name]
+        if take(sorted(substrings, key=lambda name: (len(name), name))):
+            return results
+
+        fuzzy = [name for name, count in overlap.items() if count * 2 >= len(query)]
+        take(sorted(fuzzy, key=lambda name: (-overlap[name], len(name), name)))
+
+        return results
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+
+rule_index = RuleIndex()
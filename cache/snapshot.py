@@ -0,0 +1,268 @@
+"""
+Local snapshot of the profile cache and the color catalog, so a restart
+starts warm instead of rebuilding both through the database.
+
+Layout (little-endian), version 1:
+
+    header   magic "HLSNAP", u16 version, f64 created (unix time),
+             u32 profile count, u32 color count
+    profile  i64 level, then user_id, name, nickname, color as strings
+    color    i64 role_id (-1 if unknown), then name, value, author as strings
+    string   u16 byte length (0xFFFF for None), UTF-8 bytes
+
+The file is memory-mapped when read, and written to a temporary file
+that replaces the old one, so a crash mid-write leaves the last good
+snapshot in place.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from cache.colors import ColorCatalog
+from cache.profile import ProfileCache
+from dtypes.collections.colors import ProfileColors
+from dtypes.collections.profile import ProfileRecord, find_profiles_changed_since_async
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HLSNAP"
+VERSION = 1
+
+_HEADER = struct.Struct("<6sHdII")
+_INT = struct.Struct("<q")
+_LENGTH = struct.Struct("<H")
+_NONE = 0xFFFF
+
+# writes stamped just before a snapshot may reach the cache just after it
+RECONCILE_MARGIN = 60.0
+
+
+class Snapshot(NamedTuple):
+    created: float
+    profiles: List[ProfileRecord]
+    colors: List[ProfileColors]
+
+
+def _pack_str(value: Optional[Any]) -> bytes:
+    if value is None:
+        return _LENGTH.pack(_NONE)
+
+    encoded = str(value).encode("utf-8")[: _NONE - 1]
+    return _LENGTH.pack(len(encoded)) + encoded
+
+
+def _unpack_str(buffer: Any, offset: int) -> Tuple[Optional[str], int]:
+    (length,) = _LENGTH.unpack_from(buffer, offset)
+    offset += _LENGTH.size
+    if length == _NONE:
+        return None, offset
+
+    return bytes(buffer[offset : offset + length]).decode("utf-8"), offset + length
+
+
+def _unpack_int(buffer: Any, offset: int) -> Tuple[int, int]:
+    return _INT.unpack_from(buffer, offset)[0], offset + _INT.size
+
+
+def encode(created: float, profiles: List[ProfileRecord], colors: List[ProfileColors]) -> bytes:
+    parts = [_HEADER.pack(MAGIC, VERSION, created, len(profiles), len(colors))]
+
+    for profile in profiles:
+        level = profile.level if isinstance(profile.level, int) else 0
+        parts.append(_INT.pack(level))
+        parts.extend(_pack_str(v) for v in (profile.user_id, profile.name, profile.nickname, profile.color))
+
+    for color in colors:
+        role_id = color.get("role_id")
+        parts.append(_INT.pack(role_id if role_id is not None else -1))
+        parts.extend(_pack_str(color.get(k)) for k in ("name", "value", "author"))
+
+    return b"".join(parts)
+
+
+def decode(buffer: Any) -> Snapshot:
+    """Parses a snapshot. Raises ValueError if it isn't one this version can read."""
+    try:
+        magic, version, created, profile_count, color_count = _HEADER.unpack_from(buffer, 0)
+    except struct.error:
+        raise ValueError("snapshot is truncated")
+
+    if magic != MAGIC:
+        raise ValueError("not a snapshot file")
+    if version != VERSION:
+        raise ValueError(f"unsupported snapshot version {version}")
+
+    offset = _HEADER.size
+    profiles: List[ProfileRecord] = []
+    colors: List[ProfileColors] = []
+
+    try:
+        for _ in range(profile_count):
+            level, offset = _unpack_int(buffer, offset)
+            user_id, offset = _unpack_str(buffer, offset)
+            name, offset = _unpack_str(buffer, offset)
+            nickname, offset = _unpack_str(buffer, offset)
+            color, offset = _unpack_str(buffer, offset)
+            profiles.append(ProfileRecord(user_id, name, nickname, level, color))
+
+        for _ in range(color_count):
+            role_id, offset = _unpack_int(buffer, offset)
+            name, offset = _unpack_str(buffer, offset)
+            value, offset = _unpack_str(buffer, offset)
+            author, offset = _unpack_str(buffer, offset)
+            colors.append(
+                {
+                    "name": name,
+                    "value": value,
+                    "author": int(author) if author and author.isdigit() else author,
+                    "role_id": role_id if role_id >= 0 else None,
+                }
+            )
+    except (struct.error, UnicodeDecodeError):
+        raise ValueError("snapshot is truncated or corrupt")
+
+    return Snapshot(created, profiles, colors)
+
+
+def read_snapshot(path: str) -> Optional[Snapshot]:
+    """The snapshot at `path`, or None if there isn't a usable one."""
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return decode(buffer)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring snapshot %s: %s", path, e, extra={"operation": "snapshot_read"})
+        return None
+
+
+def write_snapshot(path: str, data: bytes) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+class CacheSnapshotter:
+    """
+    Writes `cache` and `catalog` to `path` every `interval` seconds and
+    restores them from it at startup. Snapshots older than `max_age` seconds
+    are ignored. Restored profiles are checked against the database
+    `batch_size` ids at a time.
+    """
+
+    def __init__(
+        self,
+        cache: ProfileCache,
+        catalog: ColorCatalog,
+        path: str,
+        interval: float = 300.0,
+        max_age: float = 3600.0,
+        batch_size: int = 500,
+    ):
+        self.cache = cache
+        self.catalog = catalog
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.batch_size = batch_size
+
+        self.restored_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def restore(self) -> Optional[Snapshot]:
+        """Loads the snapshot into the cache and catalog. Returns it, or None if there wasn't one."""
+        snapshot = read_snapshot(self.path)
+        if snapshot is None:
+            return None
+
+        age = time.time() - snapshot.created
+        if age > self.max_age:
+            logger.info(
+                "Ignoring snapshot %s, it is %.0fs old", self.path, age, extra={"operation": "snapshot_read"}
+            )
+            return None
+
+        for profile in snapshot.profiles:
+            self.cache.put(profile.user_id, profile)
+        self.catalog.load(snapshot.colors)
+
+        self.restored_at = snapshot.created
+        return snapshot
+
+    async def reconcile(self) -> int:
+        """
+        Replaces restored profiles that were written after the snapshot was taken.
+        Returns the number of cached profiles that were refreshed.
+        """
+        if self.restored_at is None:
+            return 0
+
+        since = datetime.fromtimestamp(self.restored_at - RECONCILE_MARGIN)
+        ids = [user_id for user_id, _ in self.cache.items()]
+
+        refreshed = 0
+        for i in range(0, len(ids), self.batch_size):
+            changed = await find_profiles_changed_since_async(since, ids[i : i + self.batch_size], self.batch_size)
+            for profile in changed:
+                # may have been evicted while the batch was loading
+                if profile.user_id in self.cache:
+                    self.cache.put(profile.user_id, profile)
+                    refreshed += 1
+
+        return refreshed
+
+    async def save(self) -> None:
+        created = time.time()
+
+        # copy on the loop, encode and write off it
+        profiles = [profile for _, profile in self.cache.items()]
+        colors: List[ProfileColors] = [
+            {"name": c.name, "value": c.value, "author": c.author, "role_id": c.role_id} for c in self.catalog
+        ]
+
+        # empty caches most likely never loaded, don't replace a good snapshot with them
+        if not profiles and not colors and os.path.exists(self.path) and os.path.getsize(self.path) > _HEADER.size:
+            logger.warning(
+                "Not overwriting snapshot %s with empty caches", self.path, extra={"operation": "snapshot_write"}
+            )
+            return
+
+        try:
+            await asyncio.to_thread(lambda: write_snapshot(self.path, encode(created, profiles, colors)))
+        except OSError as e:
+            logger.error("Failed to write snapshot %s: %s", self.path, e, extra={"operation": "snapshot_write"})
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops the periodic writes and takes one last snapshot, only if `start()`
+        ran. Otherwise startup failed before the caches were loaded.
+        """
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        await self.save()
@@ -0,0 +1,162 @@
+"""
+Runs the bot as several worker processes, each owning a range of shards.
+
+    python cluster.py
+
+Workers share cache invalidations, XP flushes and catalog changes over a
+local Unix socket bus (see services.bus), and are restarted if they crash.
+Configured by the `cluster` section of config.json.
+"""
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+from logs import level_from_name, setup_logging
+from services.bus import BusClient, BusHub
+
+logger = logging.getLogger("cluster")
+
+
+def shard_ranges(shard_count: int, workers: int) -> List[List[int]]:
+    """Splits `range(shard_count)` into `workers` contiguous, nearly equal ranges."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+
+    ranges, start = [], 0
+    for worker in range(workers):
+        end = start + size + (1 if worker < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+
+    return ranges
+
+
+def run_worker(worker_id: int, shard_ids: List[int], shard_count: int, socket_path: str) -> None:
+    # Ctrl+C reaches the whole process group, leave it to the supervisor to
+    # stop workers with SIGTERM so each one closes exactly once
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # imported here so the supervisor itself never connects to the database
+    import main
+
+    main.run(
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        bus=BusClient(socket_path),
+        worker_id=worker_id,
+    )
+
+
+class Supervisor:
+    """Starts one process per shard range and restarts any that exit unexpectedly."""
+
+    def __init__(
+        self,
+        shard_count: int,
+        workers: int,
+        socket_path: str,
+        max_backoff: float = 60.0,
+        shutdown_timeout: float = 30.0,
+    ):
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, workers)
+        self.socket_path = socket_path
+        self.max_backoff = max_backoff
+        self.shutdown_timeout = shutdown_timeout
+
+        self.hub = BusHub(socket_path)
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._started_at: Dict[int, float] = {}
+        self._backoff: Dict[int, float] = {}
+        self._stopping = asyncio.Event()
+
+    def _spawn(self, worker_id: int) -> None:
+        process = self._context.Process(
+            target=run_worker,
+            args=(worker_id, self.ranges[worker_id], self.shard_count, self.socket_path),
+            name=f"hyperlands-worker-{worker_id}",
+        )
+        process.start()
+
+        self._processes[worker_id] = process
+        self._started_at[worker_id] = time.monotonic()
+        logger.info("Started worker %s (pid %s) for shards %s", worker_id, process.pid, self.ranges[worker_id])
+
+    async def _restart(self, worker_id: int, exitcode: Optional[int]) -> None:
+        # workers that stayed up for a while start over with a short delay
+        if time.monotonic() - self._started_at[worker_id] > self.max_backoff:
+            self._backoff[worker_id] = 1.0
+
+        delay = self._backoff.get(worker_id, 1.0)
+        self._backoff[worker_id] = min(delay * 2, self.max_backoff)
+
+        logger.error("Worker %s exited with %s, restarting in %.0fs", worker_id, exitcode, delay)
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            self._spawn(worker_id)
+
+    async def run(self) -> None:
+        await self.hub.start()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        for worker_id in range(len(self.ranges)):
+            self._spawn(worker_id)
+
+        restarting: Dict[int, asyncio.Task] = {}
+        while not self._stopping.is_set():
+            for worker_id, process in self._processes.items():
+                if not process.is_alive() and worker_id not in restarting:
+                    restarting[worker_id] = asyncio.create_task(self._restart(worker_id, process.exitcode))
+
+            for worker_id in [worker_id for worker_id, task in restarting.items() if task.done()]:
+                del restarting[worker_id]
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+        await self.stop()
+
+    async def stop(self) -> None:
+        logger.info("Stopping %s workers", len(self._processes))
+
+        # SIGTERM makes a worker close the bot, flushing XP, the ingest queue and the snapshot
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for worker_id, process in self._processes.items():
+            await asyncio.to_thread(process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.error("Worker %s didn't stop within %.0fs, killing it", worker_id, self.shutdown_timeout)
+                process.kill()
+                await asyncio.to_thread(process.join)
+
+        await self.hub.stop()
+
+
+if __name__ == "__main__":
+    log_listener = setup_logging(level=level_from_name(settings.get("logging.level")))
+
+    supervisor = Supervisor(
+        shard_count=settings.get_int("cluster.shard_count", 2),
+        workers=settings.get_int("cluster.workers", multiprocessing.cpu_count()),
+        socket_path=settings.get_str("cluster.socket", "/tmp/hyperlands.sock"),
+        shutdown_timeout=settings.get_float("cluster.shutdown_timeout", 30.0),
+    )
+
+    try:
+        asyncio.run(supervisor.run())
+    finally:
+        log_listener.stop()
@@ -0,0 +1,73 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+from typing import List
+
+from dtypes.roles import Role
+
+
+def _short_name(module_name: str) -> str:
+    # "..commands.community.color" -> "community.color"
+    return module_name.split("commands.", 1)[-1]
+
+
+class Reload(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(
+        name="reload", description="Reload changed commands without restarting the bot."
+    )
+    @app_commands.describe(
+        cog="The cog to reload, every changed cog is reloaded if left empty"
+    )
+    @app_commands.checks.has_any_role(
+        Role.ADMINISTRATORS.to_int(), Role.FOUNDER.to_int()
+    )
+    async def reload(self, interaction: discord.Interaction, cog: str = None):
+        # importing and syncing can take longer than an interaction may wait
+        await interaction.response.defer(ephemeral=True)
+
+        if cog is None:
+            requested = self.bot.changed_cogs()
+        else:
+            requested = [name for name in self.bot.cog_paths if _short_name(name) == cog]
+
+        if len(requested) == 0:
+            return await interaction.followup.send(
+                embed=discord.Embed(
+                    title="Nothing to reload",
+                    description=f"Couldn't find a cog named {cog}." if cog else "No cog has changed since it was loaded.",
+                    color=discord.Color.yellow()
+                ),
+                ephemeral=True
+            )
+
+        reloaded, failed = [], []
+        for module_name in requested:
+            (reloaded if await self.bot.reload_cog(module_name) else failed).append(_short_name(module_name))
+
+        embed = discord.Embed(
+            title="Reloaded commands" if not failed else "Some commands could not be reloaded",
+            color=discord.Color.green() if not failed else discord.Color.red()
+        )
+        if reloaded:
+            embed.add_field(name="Reloaded", value="\n".join(reloaded), inline=False)
+        if failed:
+            embed.add_field(name="Kept the running version", value="\n".join(failed), inline=False)
+
+        return await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @reload.autocomplete("cog")
+    async def reload_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> List[app_commands.Choice]:
+        names = sorted(_short_name(name) for name in self.bot.cog_paths)
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in names if current.lower() in name.lower()
+        ][:25]
+
+
+async def setup(bot: commands.AutoShardedBot):
+    await bot.add_cog(Reload(bot))
@@ -4,9 +4,13 @@ from discord.ext import commands
 
 from typing import List
 
-from dtypes.collections.profile import find_profile_by_id, CommunityProfile, update_profile_by_id
-from dtypes.collections.colors import find_color_by_name, ProfileColors, save as saveNewColor, get_colors, remove_color_by_name
+from dtypes.collections.profile import get_profile_async, ProfileRecord, update_profile_by_id_async
+from dtypes.collections.colors import ProfileColors, save_async as saveNewColor, remove_color_by_name_async
 from dtypes.roles import Role
+from cache.profile import profile_cache
+from cache.colors import color_catalog
+from cache.roles import role_index
+from services.roles import role_reconciler
 
 class ProfileColor(commands.Cog):
     def __init__(self, bot):
@@ -23,9 +27,20 @@ class ProfileColor(commands.Cog):
         Role.ADMINISTRATORS.to_int(), Role.FOUNDER.to_int()
     )
     async def add_color(self, interaction: discord.Interaction, name: str, value: str):
+        # color names are unique, check before creating a role we would have to throw away
+        if color_catalog.find(name) is not None:
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    title=f"Color \"{name}\" already exists",
+                    description="Remove the existing color first, or pick another name.",
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+
         # add the role to the server first and then add to db
         try:
-            await interaction.guild.create_role(
+            role = await interaction.guild.create_role(
                 name=name, 
                 color=discord.Color.from_str(value=value.lower().title()), 
                 reason=f"This role was automatically created by {interaction.user.name}")
@@ -42,10 +57,29 @@ class ProfileColor(commands.Cog):
         color: ProfileColors = {
             "name": name.lower().title(),
             "value": value,
-            "author": interaction.user.id
+            "author": interaction.user.id,
+            "role_id": role.id,
         }
 
-        saveNewColor(color)
+        try:
+            await saveNewColor(color)
+        except RuntimeError:
+            # most likely added meanwhile by someone else, don't leave the new role behind
+            try:
+                await role.delete(reason=f"Color \"{name}\" could not be saved")
+            except discord.HTTPException:
+                pass
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    title=f"Could not save color \"{name}\"",
+                    description="A color with this name may already exist.",
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+
+        await color_catalog.refresh()
+        self.bot.publish("colors.changed")
 
         return await interaction.response.send_message(
                 embed=discord.Embed(
@@ -66,9 +100,9 @@ class ProfileColor(commands.Cog):
         Role.ADMINISTRATORS.to_int(), Role.FOUNDER.to_int()
     )
     async def remove_color(self, interaction: discord.Interaction, color_name: str):
-        colors = [color["name"].lower() for color in get_colors()]
+        profile_color = color_catalog.find(color_name)
 
-        if color_name.lower() not in colors:
+        if profile_color is None:
             return await interaction.response.send_message(
                 embed=
                     discord.Embed(
@@ -80,38 +114,14 @@ class ProfileColor(commands.Cog):
                 )
         
         # remove from the guild as well
-        # check if the color is in the list of colors
-        colors: List[ProfileColors] = get_colors()
-        
-        found_color: bool = False
-        for profile_color in colors:
-            if found_color:
-                # if we already found the color, just skip.
-                continue
+        selected_role = role_index.resolve(interaction.guild, profile_color)
 
-            found_color = color_name.lower() in profile_color.get("name").lower() # otherwise check if the color was found elsewhere            
-
-        if not found_color:
-            return await interaction.response.send_message(
-                embed=
-                    discord.Embed(
-                        title="This isn't a valid color!",
-                        color=discord.Color.red(),
-                        description=f"In order to remove this color, you must provide a valid color. I couldn't recognize {color_name}"
-                    )
-                )
+        if selected_role is not None:
+            await selected_role.delete(reason=f"Color removed by {interaction.user.name}")
         
-        # get the role name
-        all_guild_roles = [role for role in interaction.guild.roles]
-        selected_role: Role = None
-
-        for role in all_guild_roles:
-            if role.name.lower().title() == color_name.lower().title():
-                selected_role = role
-
-        await interaction.guild._remove_role(selected_role)
-        
-        remove_color_by_name(color_name.lower())
+        await remove_color_by_name_async(profile_color.name)
+        await color_catalog.refresh()
+        self.bot.publish("colors.changed")
 
         return await interaction.response.send_message(
             embed=
@@ -130,7 +140,7 @@ class ProfileColor(commands.Cog):
         color="Choose from a preset of colors!"
     )
     async def color(self, interaction: discord.Interaction, color: str):
-        user: CommunityProfile = find_profile_by_id(str(interaction.user.id))
+        user: ProfileRecord = await get_profile_async(str(interaction.user.id))
 
         if user is None:
             return await interaction.response.send_message(
@@ -144,17 +154,9 @@ class ProfileColor(commands.Cog):
         
 
         # check if the color is in the list of colors
-        colors: List[ProfileColors] = get_colors()
-        
-        found_color: bool = False
-        for profile_color in colors:
-            if found_color:
-                # if we already found the color, just skip.
-                continue
+        profile_color = color_catalog.find(color)
 
-            found_color = color.lower() in profile_color.get("name").lower() # otherwise check if the color was found elsewhere            
-
-        if not found_color:
+        if profile_color is None:
             return await interaction.response.send_message(
                 embed=
                     discord.Embed(
@@ -165,42 +167,51 @@ class ProfileColor(commands.Cog):
                     ephemeral=True
                 )
         
-        # get the role name
-        all_guild_roles = [role for role in interaction.guild.roles]
-        selected_role: Role = None
+        selected_role = role_index.resolve(interaction.guild, profile_color)
 
-        for role in all_guild_roles:
-            if role.name.lower() in color.lower():
-                selected_role = role
+        if selected_role is None:
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    title="This color has no role!",
+                    color=discord.Color.red(),
+                    description=f"I couldn't find the role for {profile_color.name} in this server."
+                ),
+                ephemeral=True
+            )
 
-        await interaction.user.add_roles(selected_role, reason=f"Role automatically added by {interaction.user.name}")
+        # one member edit adds the new color and drops every other one
+        await role_reconciler.set_exclusive(
+            interaction.user,
+            selected_role,
+            color_catalog.role_ids(),
+            reason=f"Color changed by {interaction.user.name}",
+        )
 
-        # if we find any other colors aside from the color they chose, remove it.
-        all_user_roles = [role for role in interaction.user.roles]
-        
-        if update_profile_by_id(interaction.user.id, "color", color.lower()):
-            for role in all_user_roles:
-                for profile_color in colors:
-                    if role.name.lower() == profile_color.get("name").lower() and role.name.lower() != color.lower():
-                        await interaction.user.remove_roles(role, reason=f"Removed by {interaction.user.name} due to color change")
+        # the cached record is patched by the update, so keep the old color first
+        old_color = user.color
+        updated = await update_profile_by_id_async(interaction.user.id, "color", profile_color.lower)
+
+        # the member's roles changed as well, so drop the cached profile entirely
+        profile_cache.invalidate(interaction.user.id)
 
+        if updated:
             return await interaction.response.send_message(
                 embed=discord.Embed(
-                    title=f"Updated {user.get("name")}'s profile",
+                    title=f"Updated {user.name}'s profile",
                     color=discord.Color.blue(),
                 )
-                .add_field(name="Old Color", value=f"{user.get("color").lower()}")
+                .add_field(name="Old Color", value=f"{old_color.lower()}")
                 .add_field(name="New Color", value=f"{color}"),
                 ephemeral=True
             )
         else:
             return await interaction.response.send_message(
                 embed=discord.Embed(
-                    title=f"Error updating {user.get("name")}'s profile",
+                    title=f"Error updating {user.name}'s profile",
                     color=discord.Color.blue(),
                     description="Something happened that stopped us from updating your profile!"
                 )
-                .add_field(name="Old Color", value=f"{user.get("color").lower()}")
+                .add_field(name="Old Color", value=f"{old_color.lower()}")
                 .add_field(name="New Color", value=f"{color}"),
                 ephemeral=True
             )
@@ -209,12 +220,10 @@ class ProfileColor(commands.Cog):
     async def color_autocomplete(
         self, interaction: discord.Interaction, current: str
     ) -> List[app_commands.Choice]:
-        colors: List[ProfileColors] = get_colors()
-        if len(colors) > 0:
+        if len(color_catalog) > 0:
             return [
-                app_commands.Choice(name=profile_color, value=profile_color)
-                for profile_color in [color["name"] for color in colors]
-                if current.lower() in profile_color
+                app_commands.Choice(name=profile_color.name, value=profile_color.name)
+                for profile_color in color_catalog.search(current)
             ]
         
         return [
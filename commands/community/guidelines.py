@@ -6,40 +6,65 @@ from typing import List
 from datetime import datetime
 
 from dtypes.roles import Role
+from cache.rules import rule_index
 
 from dtypes.collections.rules import (
     Rules,
-    find_rule_by_name,
-    get_rules,
-    remove_rule_by_name,
-    save,
+    remove_rule_by_name_async,
+    save_async,
 )
 
 
+class RulesPager(discord.ui.View):
+    """Previous / next buttons over the prerendered `/rules` pages."""
+
+    def __init__(self, pages: List[discord.Embed], owner_id: int):
+        super().__init__(timeout=180)
+        # keep our own reference so a rebuild doesn't change pages under us
+        self.pages = pages
+        self.owner_id = owner_id
+        self.page = 0
+        self._update_buttons()
+
+    def _update_buttons(self) -> None:
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page >= len(self.pages) - 1
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        self.page = max(0, min(page, len(self.pages) - 1))
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.page], view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+
 class Guidelines(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    async def get_rules_titles(self) -> List[str]:
-        rules = get_rules()
-        return [rule["name"] for rule in rules]
-    
     @app_commands.command(
             name="rules", description="View all rules in the server!"
     )
     async def rules(self, interaction: discord.Interaction):
-        rules: List[Rules] = get_rules()
-        embed = discord.Embed(
-            title="Community Rules",
-            color=discord.Color.blue()
-        )
+        # rendered when the rules change, see RuleIndex._build
+        pages = rule_index.pages
 
-        for rule in rules:
-            embed.add_field(name=rule.get("title"), value=rule.get("description"), inline=True)
-        
-        if len(rules) > 0:
+        if len(pages) == 1:
+            return await interaction.response.send_message(embed=pages[0], ephemeral=True)
+
+        if len(pages) > 1:
             return await interaction.response.send_message(
-                embed=embed,
+                embed=pages[0],
+                view=RulesPager(pages, interaction.user.id),
                 ephemeral=True
             )
         
@@ -56,14 +81,14 @@ class Guidelines(commands.Cog):
     )
     @app_commands.describe(rule_name="The name of the rule you want to know about")
     async def rule(self, interaction: discord.Interaction, rule_name: str):
-        rule: Rules = find_rule_by_name(rule_name)
+        rule: Rules = rule_index.find(rule_name)
         if rule:
             await interaction.response.send_message(
                 embed=discord.Embed(
                     title=rule["title"],
                     color=discord.Color.yellow(),
                     description=f"> {rule['description']}",
-                ).set_author(name=f"Author: {rule['author']}").set_footer(text=f"Tags: {" ,".join(rule["tags"])}")
+                ).set_author(name=f"Author: {rule['author']}").set_footer(text=f"Tags: {' ,'.join(rule['tags'])}")
             )
         else:
             await interaction.response.send_message(
@@ -74,12 +99,10 @@ class Guidelines(commands.Cog):
     async def rule_autocomplete(
         self, interaction: discord.Interaction, current: str
     ) -> List[app_commands.Choice]:
-        rules_titles = await self.get_rules_titles()
-        if len(rules_titles) > 0:
+        if len(rule_index) > 0:
             return [
                 app_commands.Choice(name=rule_title, value=rule_title)
-                for rule_title in rules_titles
-                if current.lower() in rule_title.lower()
+                for rule_title in rule_index.search(current)
             ]
         
         return [
@@ -115,6 +138,16 @@ class Guidelines(commands.Cog):
         )
         timestamp = datetime.now()
 
+        if rule_index.find(name) is not None:
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    title=f'Rule "{name}" already exists',
+                    description="Delete the existing rule first, or pick another identifier.",
+                    color=discord.Color.red(),
+                ),
+                ephemeral=True,
+            )
+
         rule: Rules = {
             "name": name,
             "title": title,
@@ -124,7 +157,20 @@ class Guidelines(commands.Cog):
             "timestamp": timestamp,
         }
 
-        save(rule)
+        try:
+            await save_async(rule)
+        except RuntimeError:
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    title=f'Could not save rule "{name}"',
+                    description="A rule with this identifier may already exist.",
+                    color=discord.Color.red(),
+                ),
+                ephemeral=True,
+            )
+
+        await rule_index.refresh()
+        self.bot.publish("rules.changed")
 
         await interaction.response.send_message(
             embed=discord.Embed(
@@ -145,7 +191,9 @@ class Guidelines(commands.Cog):
         Role.ADMINISTRATORS.to_int(), Role.FOUNDER.to_int()
     )
     async def remove_rule(self, interaction: discord.Interaction, name: str):
-        rule: Rules = remove_rule_by_name(name=name)
+        rule: Rules = await remove_rule_by_name_async(name=name)
+        await rule_index.refresh()
+        self.bot.publish("rules.changed")
 
         if rule:
             await interaction.response.send_message(
@@ -0,0 +1,51 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from cache.leaderboard import leaderboard
+
+PAGE_SIZE = 10
+
+
+class Leaderboard(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(
+        name="leaderboard", description="See who has the highest level in the server!"
+    )
+    @app_commands.describe(page="Which page of the leaderboard to show")
+    async def leaderboard(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
+        entries = leaderboard.top(PAGE_SIZE, (page - 1) * PAGE_SIZE)
+
+        if len(entries) == 0:
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    title="Nobody is on this page!",
+                    color=discord.Color.red(),
+                    description=f"The leaderboard only has {len(leaderboard)} members right now."
+                ),
+                ephemeral=True
+            )
+
+        lines = []
+        for position, (user_id, level) in enumerate(entries, start=(page - 1) * PAGE_SIZE + 1):
+            member = interaction.guild.get_member(int(user_id)) if interaction.guild else None
+            name = member.display_name if member else f"<@{user_id}>"
+            lines.append(f"**{position}.** {name} - {level}/1000")
+
+        embed = discord.Embed(
+            title="Leaderboard",
+            color=discord.Color.blue(),
+            description="\n".join(lines)
+        )
+
+        rank = leaderboard.rank(str(interaction.user.id))
+        if rank is not None:
+            embed.set_footer(text=f"You are #{rank} of {len(leaderboard)}")
+
+        return await interaction.response.send_message(embed=embed)
+
+
+async def setup(bot: commands.AutoShardedBot):
+    await bot.add_cog(Leaderboard(bot))
@@ -5,7 +5,7 @@ from typing import List
 
 from datetime import datetime
 
-from dtypes.collections.profile import find_profile_by_id, CommunityProfile
+from dtypes.collections.profile import get_profile_async, ProfileRecord
 
 
 class Profile(commands.Cog):
@@ -16,7 +16,7 @@ class Profile(commands.Cog):
         name="profile", description="View information about your profile!"
     )
     async def profile(self, interaction: discord.Interaction):
-        user: CommunityProfile = find_profile_by_id(str(interaction.user.id))
+        user: ProfileRecord = await get_profile_async(str(interaction.user.id))
 
         if user is None:
             return await interaction.response.send_message(
@@ -29,12 +29,12 @@ class Profile(commands.Cog):
 
         return await interaction.response.send_message(
             embed=discord.Embed(
-                title=f"{user.get("name")}'s profile",
+                title=f"{user.name}'s profile",
                 color=discord.Color.blue(),
             )
-            .add_field(name="Nickname", value=f"{user.get("nickname")}")
-            .add_field(name="Level", value=f"{user.get("level")}")
-            .add_field(name="Color", value=f"{user.get("color")}")
+            .add_field(name="Nickname", value=f"{user.nickname}")
+            .add_field(name="Level", value=f"{user.level}")
+            .add_field(name="Color", value=f"{user.color}")
         )
     
     
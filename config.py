@@ -1,22 +1,135 @@
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional, Set
+
 from loaders import config
+from dtypes.config import Config
 
-def get_config_or_throw(name: str = "token") -> str:
-    config_path = "./config.json"
-    config_loader = config.ConfigLoader(config_path)
-
-    config_loader.load()
-    data = config_loader.get()
-
-    if not config_loader.validate(config_path, ["token", "guild_id", "database"]):
-        if not config_loader.has_error:
-            print("error - could not find token, guild_id, or database in config.")
-        raise LookupError("Config could not be validated.")
-    
-    if data is None:
-        if not config_loader.has_error:
-            print("error - could not find config data.")
-        raise LookupError("Could not find data in the provided config.")
-    
-    return data[0].get(name)
-    
+REQUIRED_KEYS = ["token", "guild_id", "database"]
+
+
+class Settings:
+    """
+    Process-wide configuration.
+
+    `config.json` is parsed and validated once, on first access. When hot reload
+    is enabled the file's mtime is polled, and subscribers are told which
+    top-level keys changed whenever it is reloaded.
+    """
+
+    def __init__(self, path: str = "./config.json"):
+        self.path = path
+
+        self._data: Optional[Config] = None
+        self._mtime: Optional[float] = None
+        self._listeners: List[Callable[[Set[str]], None]] = []
+
+    def _load(self) -> Config:
+        config_loader = config.ConfigLoader(self.path)
+        config_loader.load()
+
+        if not config_loader.validate(items_to_validate=REQUIRED_KEYS):
+            if not config_loader.has_error:
+                print("error - could not find token, guild_id, or database in config.")
+            raise LookupError("Config could not be validated.")
+
+        data = config_loader.get()
+        if data is None:
+            if not config_loader.has_error:
+                print("error - could not find config data.")
+            raise LookupError("Could not find data in the provided config.")
+
+        self._mtime = config_loader.mtime
+        return data[0]
+
+    def use(self, data: Config) -> None:
+        """Uses `data` instead of reading the config file, for tooling that runs without one."""
+        self._data = data
+        self._mtime = None
+
+    @property
+    def data(self) -> Config:
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Looks up a value, dotted names (e.g. `cache.profile_ttl`) walk into sections."""
+        value: Any = self.data
+        for part in name.split("."):
+            if not isinstance(value, dict) or part not in value:
+                return default
+            value = value[part]
+        return value
+
+    def get_str(self, name: str, default: str = "") -> str:
+        value = self.get(name, default)
+        return default if value is None else str(value)
+
+    def get_int(self, name: str, default: int = 0) -> int:
+        try:
+            return int(self.get(name, default))
+        except (TypeError, ValueError):
+            return default
 
+    def get_float(self, name: str, default: float = 0.0) -> float:
+        try:
+            return float(self.get(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, name: str, default: bool = False) -> bool:
+        value = self.get(name, default)
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return bool(value)
+
+    def section(self, name: str) -> Dict[str, Any]:
+        value = self.get(name, {})
+        return value if isinstance(value, dict) else {}
+
+    def subscribe(self, callback: Callable[[Set[str]], None]) -> None:
+        """Registers `callback` to be called with the changed top-level keys after a reload."""
+        self._listeners.append(callback)
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the config if the file changed on disk. Returns True if it was reloaded."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+
+        if self._data is not None and mtime == self._mtime:
+            return False
+
+        try:
+            data = self._load()
+        except LookupError:
+            # keep serving the last good config
+            return False
+
+        old = self._data or {}
+        self._data = data
+
+        changed = {key for key in set(old) | set(data) if old.get(key) != data.get(key)}
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"error - config listener failed: {e}")
+
+        return True
+
+    async def watch(self, interval: float = 5.0) -> None:
+        """Polls for changes to the config file forever."""
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+
+settings = Settings()
+
+
+def get_config_or_throw(name: str = "token") -> str:
+    return settings.get(name)
@@ -1,87 +1,553 @@
 # database.py
-from pymongo import MongoClient, errors
-from typing import Any, Dict, List
+from pymongo import MongoClient, ReturnDocument, UpdateOne, WriteConcern, errors
+from pymongo.collection import Collection
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import functools
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from services.metrics import timed_operation
+from storage.base import Storage
+
+# handlers are configured by the entrypoint, see logs.setup_logging
 logger = logging.getLogger(__name__)
 
+# `database` options in config.json and the MongoClient keyword each one maps to
+CLIENT_OPTIONS = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "max_idle_time_ms": "maxIdleTimeMS",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "socket_timeout_ms": "socketTimeoutMS",
+    "zlib_compression_level": "zlibCompressionLevel",
+    "read_preference": "readPreference",
+    "app_name": "appname",
+}
+
+
+def client_config(config: Union[str, Dict[str, Any]], client: str = "default") -> Dict[str, Any]:
+    """
+    Resolves the settings for `client` from the `database` section, which is
+    either a plain URI or an object. Named clients under `clients` inherit
+    every top-level setting they don't override.
+    """
+    if isinstance(config, str):
+        config = {"uri": config}
+
+    resolved = {k: v for k, v in config.items() if k != "clients"}
+    if client != "default":
+        named = config.get("clients", {}).get(client)
+        if named is None:
+            raise ValueError(f"No database client named {client!r} is configured.")
+        resolved.update(named)
+
+    return resolved
+
+
+def client_kwargs(options: Dict[str, Any]) -> Dict[str, Any]:
+    """The `MongoClient` keyword arguments for a resolved client config."""
+    kwargs: Dict[str, Any] = {"serverSelectionTimeoutMS": 5000}
+    for option, keyword in CLIENT_OPTIONS.items():
+        if options.get(option) is not None:
+            kwargs[keyword] = options[option]
+
+    compressors = options.get("compressors")
+    if compressors:
+        kwargs["compressors"] = compressors if isinstance(compressors, str) else ",".join(compressors)
+
+    return kwargs
+
+
 class MongoDB:
-    _instance = None 
-
-    def __new__(cls, uri: str, database_name: str):
-        if cls._instance is None:
-            try:
-                cls._instance = super(MongoDB, cls).__new__(cls)
-                cls._instance.client = MongoClient(uri, serverSelectionTimeoutMS=5000)
-                cls._instance.db = cls._instance.client[database_name]
-                cls._instance.client.admin.command('ping')
-                logger.info(f"Connected to MongoDB database: {database_name}")
-            except errors.ServerSelectionTimeoutError as e:
-                logger.error(f"Unable to connect to the database: {e}")
-                raise ConnectionError("Database connection failed.")
-        return cls._instance
+    """
+    One instance per (client name, database name). Instances with the same
+    client name share a `MongoClient`, and therefore its connection pool.
+    """
+    _instances: Dict[Tuple[str, str], "MongoDB"] = {}
+    _clients: Dict[str, Tuple[str, MongoClient]] = {}
+
+    def __new__(cls, config: Union[str, Dict[str, Any]], database_name: str, client: str = "default"):
+        key = (client, database_name)
+        if key not in cls._instances:
+            options = client_config(config, client)
+
+            instance = super(MongoDB, cls).__new__(cls)
+            instance.name = client
+            instance.write_concerns = {
+                target: WriteConcern(**concern) for target, concern in options.get("write_concerns", {}).items()
+            }
+            instance.client = cls._connect(client, options)
+            instance.db = instance.client[database_name]
+            instance._collections = {}
+
+            cls._instances[key] = instance
+            logger.info("Using MongoDB database %s on client %s", database_name, client)
+        return cls._instances[key]
+
+    @classmethod
+    def _connect(cls, client: str, options: Dict[str, Any]) -> MongoClient:
+        uri = options.get("uri", "")
+
+        if client in cls._clients:
+            connected_uri, mongo_client = cls._clients[client]
+            if connected_uri != uri:
+                raise ValueError(f"Database client {client!r} is already connected to a different URI.")
+            return mongo_client
+
+        try:
+            mongo_client = MongoClient(uri, **client_kwargs(options))
+            mongo_client.admin.command('ping')
+            logger.info("Connected MongoDB client: %s", client)
+        except errors.ServerSelectionTimeoutError as e:
+            logger.error("Unable to connect to the database: %s", e, extra={"error": str(e)})
+            raise ConnectionError("Database connection failed.")
 
+        cls._clients[client] = (uri, mongo_client)
+        return mongo_client
+
+    def _collection(self, collection: str, operation: str) -> Collection:
+        """
+        `collection` with the write concern configured for it. A concern set
+        for "collection.operation" takes precedence over one for "collection".
+        """
+        target = f"{collection}.{operation}"
+        if target not in self.write_concerns:
+            target = collection
+
+        handle = self._collections.get(target)
+        if handle is None:
+            handle = self.db.get_collection(collection, write_concern=self.write_concerns.get(target))
+            self._collections[target] = handle
+        return handle
+
+    @timed_operation
     def insert_one(self, collection: str, document: Dict[str, Any]) -> Any:
         """Insert a document into a collection."""
         try:
-            result = self.db[collection].insert_one(document)
-            logger.info(f"Document inserted into {collection}: {result.inserted_id}")
+            result = self._collection(collection, "insert_one").insert_one(document)
+            logger.info(
+                "Document inserted into %s: %s",
+                collection,
+                result.inserted_id,
+                extra={"operation": "insert_one", "collection": collection},
+            )
             return result.inserted_id
         except Exception as e:
-            logger.error(f"Failed to insert document into {collection}: {e}")
+            logger.error(
+                "Failed to insert document into %s: %s",
+                collection,
+                e,
+                extra={"operation": "insert_one", "collection": collection, "error": str(e)},
+            )
             raise RuntimeError(f"Failed to insert document: {e}")
 
-    def get_all(self, collection: str) -> List[Dict[str, Any]]:
-        """Retrieve all documents from a collection"""
+    @timed_operation
+    def get_all(self, collection: str, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Retrieve all documents from a collection, optionally only the fields in `projection`."""
         try:
-            cursor = self.db[collection].find()
+            cursor = self._collection(collection, "get_all").find({}, projection)
             documents = list(cursor)
-            logger.info(f"Retrieved {len(documents)} documents from {collection}")
+            logger.info(
+                "Retrieved %s documents from %s",
+                len(documents),
+                collection,
+                extra={"operation": "get_all", "collection": collection},
+            )
             return documents
         except Exception as e:
-            logger.error(f"Failed to retrieve documents from {collection}: {e}")
+            logger.error(
+                "Failed to retrieve documents from %s: %s",
+                collection,
+                e,
+                extra={"operation": "get_all", "collection": collection, "error": str(e)},
+            )
             raise RuntimeError(f"Failed to retrieve documents: {e}")
 
-    def find_one(self, collection: str, query: Dict[str, Any]) -> Dict[str, Any]:
-        """Find a single document in a collection."""
+    @timed_operation
+    def find_one(
+        self, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Find a single document in a collection, optionally only the fields in `projection`."""
         try:
-            result = self.db[collection].find_one(query)
+            result = self._collection(collection, "find_one").find_one(query, projection)
             if result:
-                logger.info(f"Document found in {collection} with query: {query}")
+                logger.info(
+                    "Document found in %s",
+                    collection,
+                    extra={"operation": "find_one", "collection": collection, "query": query},
+                )
             else:
-                logger.warning(f"No document found in {collection} with query: {query}")
+                logger.warning(
+                    "No document found in %s",
+                    collection,
+                    extra={"operation": "find_one", "collection": collection, "query": query},
+                )
             return result
         except Exception as e:
-            logger.error(f"Failed to find document in {collection}: {e}")
+            logger.error(
+                "Failed to find document in %s: %s",
+                collection,
+                e,
+                extra={"operation": "find_one", "collection": collection, "error": str(e)},
+            )
             raise RuntimeError(f"Failed to find document: {e}")
 
+    @timed_operation
+    def find_many(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find every document matching `query`, optionally only the fields in
+        `projection`. `batch_size` sets how many documents each round trip of
+        the cursor returns.
+        """
+        try:
+            cursor = self._collection(collection, "find_many").find(query, projection)
+            if batch_size:
+                cursor = cursor.batch_size(batch_size)
+            documents = list(cursor)
+            logger.info(
+                "Found %s documents in %s",
+                len(documents),
+                collection,
+                extra={"operation": "find_many", "collection": collection},
+            )
+            return documents
+        except Exception as e:
+            logger.error(
+                "Failed to find documents in %s: %s",
+                collection,
+                e,
+                extra={"operation": "find_many", "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to find documents: {e}")
+
+    @timed_operation
     def delete_one(self, collection: str, query: Dict[str, Any]) -> bool:
         """Delete a single document from a collection."""
         try:
-            result = self.db[collection].delete_one(query)
+            result = self._collection(collection, "delete_one").delete_one(query)
             if result.deleted_count > 0:
-                logger.info(f"Document deleted from {collection} with query: {query}")
+                logger.info(
+                    "Document deleted from %s",
+                    collection,
+                    extra={"operation": "delete_one", "collection": collection, "query": query},
+                )
             else:
-                logger.warning(f"No document found to delete in {collection} with query: {query}")
+                logger.warning(
+                    "No document found to delete in %s",
+                    collection,
+                    extra={"operation": "delete_one", "collection": collection, "query": query},
+                )
             return result.deleted_count > 0
         except Exception as e:
-            logger.error(f"Failed to delete document from {collection}: {e}")
+            logger.error(
+                "Failed to delete document from %s: %s",
+                collection,
+                e,
+                extra={"operation": "delete_one", "collection": collection, "error": str(e)},
+            )
             raise RuntimeError(f"Failed to delete document: {e}")
 
+    @timed_operation
     def update_one(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
         """Update a single document in a collection."""
         try:
-            result = self.db[collection].update_one(query, {"$set": update})
+            result = self._collection(collection, "update_one").update_one(query, {"$set": update})
             if result.matched_count > 0:
                 if result.modified_count > 0:
-                    logger.info(f"Document updated in {collection} with query: {query}")
+                    logger.info(
+                        "Document updated in %s",
+                        collection,
+                        extra={"operation": "update_one", "collection": collection, "query": query},
+                    )
                 else:
-                    logger.warning(f"Document found but not modified in {collection}: {query}")
+                    logger.warning(
+                        "Document found but not modified in %s",
+                        collection,
+                        extra={"operation": "update_one", "collection": collection, "query": query},
+                    )
             else:
-                logger.warning(f"No document found to update in {collection}: {query}")
+                logger.warning(
+                    "No document found to update in %s",
+                    collection,
+                    extra={"operation": "update_one", "collection": collection, "query": query},
+                )
             return result.modified_count > 0
         except Exception as e:
-            logger.error(f"Failed to update document in {collection}: {e}")
+            logger.error(
+                "Failed to update document in %s: %s",
+                collection,
+                e,
+                extra={"operation": "update_one", "collection": collection, "error": str(e)},
+            )
             raise RuntimeError(f"Failed to update document: {e}")
+
+    @timed_operation
+    def update_many(self, collection: str, query: Dict[str, Any], update: Any) -> int:
+        """
+        Update every matching document in a collection. `update` is passed through
+        as-is, so it can be an update document or an aggregation pipeline.
+        """
+        try:
+            result = self._collection(collection, "update_many").update_many(query, update)
+            logger.info(
+                "Updated %s documents in %s",
+                result.modified_count,
+                collection,
+                extra={"operation": "update_many", "collection": collection, "query": query},
+            )
+            return result.modified_count
+        except Exception as e:
+            logger.error(
+                "Failed to update documents in %s: %s",
+                collection,
+                e,
+                extra={"operation": "update_many", "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to update documents: {e}")
+
+    @timed_operation
+    def find_one_and_update(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Atomically update a single document and return it after the update.
+        Unlike `update_one`, `update` is passed through as-is, so it may use any
+        update operators (e.g. `$setOnInsert` together with `upsert=True`).
+        """
+        try:
+            result = self._collection(collection, "find_one_and_update").find_one_and_update(
+                query,
+                update,
+                projection=projection,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER,
+            )
+            if result:
+                logger.info(
+                    "Document found or created in %s",
+                    collection,
+                    extra={"operation": "find_one_and_update", "collection": collection, "query": query},
+                )
+            else:
+                logger.warning(
+                    "No document found to update in %s",
+                    collection,
+                    extra={"operation": "find_one_and_update", "collection": collection, "query": query},
+                )
+            return result
+        except Exception as e:
+            logger.error(
+                "Failed to find and update document in %s: %s",
+                collection,
+                e,
+                extra={"operation": "find_one_and_update", "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to find and update document: {e}")
+
+    @timed_operation
+    def create_index(self, collection: str, keys: str, unique: bool = False) -> str:
+        """Ensure an ascending index on `keys` exists for a collection."""
+        try:
+            name = self._collection(collection, "create_index").create_index(keys, unique=unique)
+            logger.info(
+                "Ensured index %s on %s",
+                name,
+                collection,
+                extra={"operation": "create_index", "collection": collection},
+            )
+            return name
+        except Exception as e:
+            logger.error(
+                "Failed to create index on %s: %s",
+                collection,
+                e,
+                extra={"operation": "create_index", "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to create index: {e}")
+
+    @timed_operation
+    def explain(self, collection: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the query planner output for a find on a collection."""
+        try:
+            return self._collection(collection, "explain").find(query).explain()
+        except Exception as e:
+            logger.error(
+                "Failed to explain query on %s: %s",
+                collection,
+                e,
+                extra={"operation": "explain", "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to explain query: {e}")
+
+    @timed_operation
+    def increment_many(
+        self,
+        collection: str,
+        key: str,
+        field: str,
+        deltas: Dict[Any, int],
+        cap: Optional[int] = None,
+        also_set: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Adds a per-document delta to a numeric field in a single bulk write.
+        Documents are matched on `key`. When `cap` is given the field is clamped
+        to it on the server, so no read is needed beforehand, and documents
+        whose field isn't numeric are left alone. Fields in `also_set` are set
+        on every document that is updated.
+        """
+        also_set = also_set or {}
+
+        operations = []
+        for value, delta in deltas.items():
+            increment = {"$inc": {field: delta}, **({"$set": also_set} if also_set else {})}
+            if cap is None:
+                operations.append(UpdateOne({key: value}, increment))
+                continue
+
+            # a pipeline update adds and clamps in one step, so each document
+            # is written once and the batch can run unordered
+            clamped = {"$min": [{"$add": [f"${field}", delta]}, cap]}
+            literals = {k: {"$literal": v} for k, v in also_set.items()}
+            operations.append(
+                UpdateOne({key: value, field: {"$type": "number"}}, [{"$set": {field: clamped, **literals}}])
+            )
+
+        if not operations:
+            return 0
+
+        try:
+            result = self._collection(collection, "increment_many").bulk_write(operations, ordered=False)
+            if not result.acknowledged:
+                # w: 0, the server doesn't report what changed
+                return len(deltas)
+
+            logger.info(
+                "Incremented %s on %s documents in %s",
+                field,
+                result.modified_count,
+                collection,
+                extra={"operation": "increment_many", "collection": collection},
+            )
+            return result.modified_count
+        except Exception as e:
+            logger.error(
+                "Failed to increment %s in %s: %s",
+                field,
+                collection,
+                e,
+                extra={"operation": "increment_many", "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to increment documents: {e}")
+
+
+    def close(self) -> None:
+        """Closes the client, and with it every database on it."""
+        self.client.close()
+
+
+class AsyncMongoDB:
+    """
+    Awaitable facade over any `storage.base.Storage`, `MongoDB` included.
+
+    The backends are synchronous, so every call is handed to a bounded thread pool
+    instead of running on the event loop that serves the shards. There is one
+    facade per storage instance, all sharing the same pool.
+    """
+    _instances: Dict[int, "AsyncMongoDB"] = {}
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __new__(cls, db: Storage, max_workers: int = 8):
+        if AsyncMongoDB._executor is None:
+            AsyncMongoDB._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="mongodb"
+            )
+
+        if id(db) not in cls._instances:
+            instance = super(AsyncMongoDB, cls).__new__(cls)
+            instance.db = db
+            instance.executor = AsyncMongoDB._executor
+            cls._instances[id(db)] = instance
+        return cls._instances[id(db)]
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def insert_one(self, collection: str, document: Dict[str, Any]) -> Any:
+        """Insert a document into a collection."""
+        return await self._run(self.db.insert_one, collection, document)
+
+    async def get_all(self, collection: str, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Retrieve all documents from a collection, optionally only the fields in `projection`."""
+        return await self._run(self.db.get_all, collection, projection)
+
+    async def find_one(
+        self, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Find a single document in a collection, optionally only the fields in `projection`."""
+        return await self._run(self.db.find_one, collection, query, projection)
+
+    async def find_many(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Find every document matching `query`, optionally only the fields in `projection`."""
+        return await self._run(self.db.find_many, collection, query, projection, batch_size)
+
+    async def delete_one(self, collection: str, query: Dict[str, Any]) -> bool:
+        """Delete a single document from a collection."""
+        return await self._run(self.db.delete_one, collection, query)
+
+    async def update_one(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        """Update a single document in a collection."""
+        return await self._run(self.db.update_one, collection, query, update)
+
+    async def update_many(self, collection: str, query: Dict[str, Any], update: Any) -> int:
+        """Update every matching document in a collection."""
+        return await self._run(self.db.update_many, collection, query, update)
+
+    async def find_one_and_update(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Atomically update a single document and return it after the update."""
+        return await self._run(self.db.find_one_and_update, collection, query, update, upsert, projection)
+
+    async def increment_many(
+        self,
+        collection: str,
+        key: str,
+        field: str,
+        deltas: Dict[Any, int],
+        cap: Optional[int] = None,
+        also_set: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """Adds a per-document delta to a numeric field in a single bulk write."""
+        return await self._run(self.db.increment_many, collection, key, field, deltas, cap, also_set)
+
+    def shutdown(self) -> None:
+        """Waits for in-flight queries, stops the worker threads and closes the storage."""
+        self.executor.shutdown(wait=True)
+        self.db.close()
@@ -1,41 +1,77 @@
 from typing import TypedDict, List
 
-from database import MongoDB
-from config import get_config_or_throw
+from database import AsyncMongoDB
+from storage.backends import open_storage
 from datetime import datetime
 
 
 # instantiate the database
-db = MongoDB(get_config_or_throw("database"), "community")
+db = open_storage("community")
+async_db = AsyncMongoDB(db)
 
 
 class ProfileColors(TypedDict):
     name: str
     value: str
     author: str
+    role_id: int
+
+
+def _to_document(data: ProfileColors) -> dict:
+    return {
+        "name": data.get("name"),
+        "value": data.get("value"),
+        "author": data.get("author"),
+        "role_id": data.get("role_id"),
+    }
+
+
+def _normalise(name: str) -> str:
+    # colors are saved title-cased by /add_color
+    return name.strip().lower().title()
 
 
 def save(data: ProfileColors):
-    db.insert_one(
-        "colors",
-        {
-            "name": data.get("name"),
-            "value": data.get("value"),
-            "author": data.get("author"),
-        },
-    )
+    db.insert_one("colors", _to_document(data))
 
 
 def find_color_by_name(name: str):
-    return db.find_one("colors", {"name": name.strip().lower()})
+    return db.find_one("colors", {"name": _normalise(name)})
 
 
 def remove_color_by_name(name: str):
-    rule = find_color_by_name(name.strip().lower())
-    db.delete_one("colors", {"name": name.strip().lower()})
+    rule = find_color_by_name(name)
+    db.delete_one("colors", {"name": _normalise(name)})
 
     return rule
 
 
 def get_colors() -> List[ProfileColors]:
-    return db.get_all("colors")
+    return db.get_all("colors", {"_id": 0})
+
+
+def set_color_role(name: str, role_id: int) -> bool:
+    return db.update_one("colors", {"name": _normalise(name)}, {"role_id": role_id})
+
+
+async def save_async(data: ProfileColors):
+    await async_db.insert_one("colors", _to_document(data))
+
+
+async def find_color_by_name_async(name: str):
+    return await async_db.find_one("colors", {"name": _normalise(name)})
+
+
+async def remove_color_by_name_async(name: str):
+    rule = await find_color_by_name_async(name)
+    await async_db.delete_one("colors", {"name": _normalise(name)})
+
+    return rule
+
+
+async def get_colors_async() -> List[ProfileColors]:
+    return await async_db.get_all("colors", {"_id": 0})
+
+
+async def set_color_role_async(name: str, role_id: int) -> bool:
+    return await async_db.update_one("colors", {"name": _normalise(name)}, {"role_id": role_id})
@@ -0,0 +1,85 @@
+from typing import TypedDict, List, Dict, Any
+from datetime import datetime
+
+from storage.backends import open_storage
+
+
+# instantiate the database
+db = open_storage("community")
+
+
+class IndexSpec(TypedDict):
+    collection: str
+    keys: str
+    unique: bool
+
+
+class QueryShape(TypedDict):
+    collection: str
+    query: Dict[str, Any]
+
+
+# every index the collection helpers rely on
+INDEXES: List[IndexSpec] = [
+    # one profile per user, this also lets concurrent upserts settle on a single document
+    {"collection": "profiles", "keys": "user_id", "unique": True},
+    {"collection": "colors", "keys": "name", "unique": True},
+    {"collection": "rules", "keys": "name", "unique": True},
+    # profile writes bump the timestamp, so restarts can fetch only what changed
+    {"collection": "profiles", "keys": "timestamp", "unique": False},
+]
+
+# a sample of each filter the collection helpers issue, used to check query plans
+QUERY_SHAPES: List[QueryShape] = [
+    {"collection": "profiles", "query": {"user_id": "0"}},
+    {"collection": "profiles", "query": {"user_id": "0", "level": {"$type": "number"}}},
+    {"collection": "profiles", "query": {"user_id": {"$in": ["0", "1"]}}},
+    {"collection": "profiles", "query": {"user_id": {"$in": ["0", "1"]}, "timestamp": {"$gt": datetime(2024, 1, 1)}}},
+    {"collection": "colors", "query": {"name": "Default"}},
+    {"collection": "rules", "query": {"name": "default"}},
+]
+
+
+def ensure_indexes() -> None:
+    """Creates any missing index in `INDEXES`."""
+    for index in INDEXES:
+        try:
+            db.create_index(index["collection"], index["keys"], unique=index["unique"])
+        except RuntimeError:
+            # usually duplicate documents, keep starting but make it visible
+            print(
+                f"error - could not create index on {index['collection']}.{index['keys']}, "
+                "check for duplicate documents."
+            )
+
+
+def _stages(plan: Any) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(_stages(value))
+        return stages
+
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _stages(item)]
+
+    return []
+
+
+def verify_query_plans() -> None:
+    """Explains every shape in `QUERY_SHAPES` and raises if any would scan a whole collection."""
+    scans = []
+    for shape in QUERY_SHAPES:
+        winning_plan = db.explain(shape["collection"], shape["query"])["queryPlanner"]["winningPlan"]
+
+        if "COLLSCAN" in _stages(winning_plan):
+            scans.append(f"{shape['collection']} {shape['query']}")
+
+    if scans:
+        raise RuntimeError(f"Queries are not covered by an index: {'; '.join(scans)}")
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    verify_query_plans()
+    print("indexes - every query shape uses an index")
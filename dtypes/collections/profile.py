@@ -1,10 +1,12 @@
-from typing import TypedDict, Any
+from typing import TypedDict, Any, Dict, List, Optional
 from datetime import datetime
 
-from database import MongoDB
-from config import get_config_or_throw
+from database import AsyncMongoDB, MongoDB
+from storage.backends import open_storage
+from cache.profile import profile_cache
 
-db = MongoDB(get_config_or_throw("database"), "community")
+db = open_storage("community")
+async_db = AsyncMongoDB(db)
 
 
 class CommunityProfile(TypedDict):
@@ -22,27 +24,210 @@ class CommunityProfile(TypedDict):
     last_deleted_message: str = None
 
 
+class ProfileRecord:
+    """
+    Compact in-memory profile, holding only the fields the bot reads.
+    This is what the profile cache and the cogs work with.
+    """
+
+    __slots__ = ("user_id", "name", "nickname", "level", "color")
+
+    def __init__(self, user_id: str, name: str, nickname: str, level: int, color: str):
+        self.user_id = user_id
+        self.name = name
+        self.nickname = nickname
+        self.level = level
+        self.color = color
+
+    @classmethod
+    def from_document(cls, document: Optional[CommunityProfile]) -> Optional["ProfileRecord"]:
+        if document is None:
+            return None
+
+        return cls(
+            user_id=document.get("user_id"),
+            name=document.get("name"),
+            nickname=document.get("nickname"),
+            level=document.get("level"),
+            color=document.get("color"),
+        )
+
+
+# only fetch what a ProfileRecord holds
+PROFILE_PROJECTION = {"_id": 0, **{field: 1 for field in ProfileRecord.__slots__}}
+
+
+def _to_document(data: CommunityProfile) -> dict:
+    return {
+        "name": data.get("name"),
+        "user_id": data.get("user_id"),
+        "level": data.get("level"),
+        "nickname": data.get("nickname"),
+        "color": data.get("color"),
+        "timestamp": datetime.now(),
+        "last_edited_message": data.get("last_edited_message") or "none",
+        "last_deleted_message": data.get("last_deleted_message") or "none",
+    }
+
+
+def _sync_cache(profile_id: str, k: str, v: Any, updated: bool) -> None:
+    # keep the cached copy in step with the database
+    if updated:
+        profile_cache.patch(profile_id, k, v)
+    else:
+        profile_cache.invalidate(profile_id)
+
+
+def _insert_only(data: CommunityProfile) -> dict:
+    document = _to_document(data)
+    document.pop("user_id")
+
+    return {"$setOnInsert": document}
+
+
 def save(data: CommunityProfile):
-    db.insert_one(
-        "profiles",
-        {
-            "name": data.get("name"),
-            "user_id": data.get("user_id"),
-            "level": data.get("level"),
-            "nickname": data.get("nickname"),
-            "color": data.get("color"),
-            "timestamp": datetime.now(),
-            "last_edited_message": data.get("last_edited_message") or "none",
-            "last_deleted_message": data.get("last_deleted_message") or "none",
-        },
-    )
+    db.insert_one("profiles", _to_document(data))
 
 
-def find_profile_by_id(id: str):
-    return db.find_one("profiles", {"user_id": id})
+def find_profile_by_id(id: str, projection: Optional[Dict[str, Any]] = None):
+    return db.find_one("profiles", {"user_id": id}, projection)
+
+def get_or_create_profile(data: CommunityProfile) -> ProfileRecord:
+    """Returns the profile for `data["user_id"]`, creating it from `data` if it doesn't exist."""
+    return ProfileRecord.from_document(
+        db.find_one_and_update(
+            "profiles",
+            {"user_id": data.get("user_id")},
+            _insert_only(data),
+            upsert=True,
+            projection=PROFILE_PROJECTION,
+        )
+    )
+
 
 def update_profile_by_id(profile_id: str, k: str, v: Any):
-    profile = db.update_one("profiles", {"user_id": f"{profile_id}"}, {k: v})
+    profile = db.update_one("profiles", {"user_id": f"{profile_id}"}, {k: v, "timestamp": datetime.now()})
+    _sync_cache(profile_id, k, v, profile)
 
     print(profile)
     return profile
+
+
+async def save_async(data: CommunityProfile):
+    await async_db.insert_one("profiles", _to_document(data))
+
+
+async def find_profile_by_id_async(id: str, projection: Optional[Dict[str, Any]] = None):
+    return await async_db.find_one("profiles", {"user_id": id}, projection)
+
+
+async def get_profile_async(user_id: str) -> Optional[ProfileRecord]:
+    """Returns the profile for `user_id` from the cache, or from the database on a miss."""
+    user_id = str(user_id)
+    profile = profile_cache.get(user_id)
+
+    if profile is None:
+        profile = ProfileRecord.from_document(
+            await find_profile_by_id_async(user_id, PROFILE_PROJECTION)
+        )
+        if profile is not None:
+            profile_cache.put(user_id, profile)
+
+    return profile
+
+
+async def find_profiles_by_ids_async(ids: List[str], batch_size: Optional[int] = None) -> List[ProfileRecord]:
+    """Loads the profiles for every id in `ids` with a single `$in` query."""
+    documents = await async_db.find_many(
+        "profiles", {"user_id": {"$in": list(ids)}}, PROFILE_PROJECTION, batch_size
+    )
+    return [ProfileRecord.from_document(document) for document in documents]
+
+
+async def find_profiles_changed_since_async(
+    since: datetime, ids: List[str], batch_size: Optional[int] = None
+) -> List[ProfileRecord]:
+    """Profiles among `ids` written after `since`. Every profile write bumps `timestamp`."""
+    documents = await async_db.find_many(
+        "profiles", {"user_id": {"$in": list(ids)}, "timestamp": {"$gt": since}}, PROFILE_PROJECTION, batch_size
+    )
+    return [ProfileRecord.from_document(document) for document in documents]
+
+
+async def get_or_create_profile_async(data: CommunityProfile) -> ProfileRecord:
+    """Returns the profile for `data["user_id"]`, creating it from `data` if it doesn't exist."""
+    return ProfileRecord.from_document(
+        await async_db.find_one_and_update(
+            "profiles",
+            {"user_id": data.get("user_id")},
+            _insert_only(data),
+            upsert=True,
+            projection=PROFILE_PROJECTION,
+        )
+    )
+
+
+async def update_profile_by_id_async(profile_id: str, k: str, v: Any):
+    profile = await async_db.update_one("profiles", {"user_id": f"{profile_id}"}, {k: v, "timestamp": datetime.now()})
+    _sync_cache(profile_id, k, v, profile)
+
+    return profile
+
+
+async def add_levels_async(deltas: Dict[str, int], cap: int) -> int:
+    """Applies accumulated XP per user id in one write, capped at `cap`."""
+    return await async_db.increment_many(
+        "profiles", "user_id", "level", deltas, cap, {"timestamp": datetime.now()}
+    )
+
+
+async def get_levels_async() -> List[CommunityProfile]:
+    """Every profile's `user_id` and `level`, for ranking."""
+    return await async_db.get_all("profiles", {"_id": 0, "user_id": 1, "level": 1})
+
+
+def _parse_level(level: str) -> int:
+    # same result as the $convert below: the part before "/", or 0 if it isn't a number
+    try:
+        return int(level.split("/")[0])
+    except ValueError:
+        return 0
+
+
+async def migrate_levels_async() -> int:
+    """
+    Older versions stored levels as strings like "105/1000". Converts them back
+    to integers so they can be sorted and `$inc`'d. Safe to run repeatedly.
+    """
+    if not isinstance(db, MongoDB):
+        # pipeline updates are Mongo only, convert what the other backends hold here
+        documents = await async_db.find_many(
+            "profiles", {"level": {"$type": "string"}}, {"_id": 0, "user_id": 1, "level": 1}
+        )
+        migrated = 0
+        for document in documents:
+            migrated += await async_db.update_one(
+                "profiles",
+                {"user_id": document["user_id"], "level": document["level"]},
+                {"level": _parse_level(document["level"])},
+            )
+        return migrated
+
+    return await async_db.update_many(
+        "profiles",
+        {"level": {"$type": "string"}},
+        [
+            {
+                "$set": {
+                    "level": {
+                        "$convert": {
+                            "input": {"$arrayElemAt": [{"$split": ["$level", "/"]}, 0]},
+                            "to": "int",
+                            "onError": 0,
+                            "onNull": 0,
+                        }
+                    }
+                }
+            }
+        ],
+    )
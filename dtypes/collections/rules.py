@@ -1,12 +1,13 @@
 from typing import TypedDict, List
 
-from database import MongoDB
-from config import get_config_or_throw
+from database import AsyncMongoDB
+from storage.backends import open_storage
 from datetime import datetime
 
 
 # instantiate the database
-db = MongoDB(get_config_or_throw("database"), "community")
+db = open_storage("community")
+async_db = AsyncMongoDB(db)
 
 
 class Rules(TypedDict):
@@ -18,18 +19,19 @@ class Rules(TypedDict):
     timestamp: datetime
 
 
+def _to_document(data: Rules) -> dict:
+    return {
+        "name": data.get("name"),
+        "title": data.get("title"),
+        "author": data.get("author"),
+        "description": data.get("description"),
+        "tags": data.get("tags"),
+        "timestamp": datetime.now(),
+    }
+
+
 def save(data: Rules):
-    db.insert_one(
-        "rules",
-        {
-            "name": data.get("name"),
-            "title": data.get("title"),
-            "author": data.get("author"),
-            "description": data.get("description"),
-            "tags": data.get("tags"),
-            "timestamp": datetime.now(),
-        },
-    )
+    db.insert_one("rules", _to_document(data))
 
 
 def find_rule_by_name(name: str):
@@ -44,4 +46,23 @@ def remove_rule_by_name(name: str):
 
 
 def get_rules() -> List[Rules]:
-    return db.get_all("rules")
+    return db.get_all("rules", {"_id": 0})
+
+
+async def save_async(data: Rules):
+    await async_db.insert_one("rules", _to_document(data))
+
+
+async def find_rule_by_name_async(name: str):
+    return await async_db.find_one("rules", {"name": name.strip().lower()})
+
+
+async def remove_rule_by_name_async(name: str):
+    rule = await find_rule_by_name_async(name.strip().lower())
+    await async_db.delete_one("rules", {"name": name.strip().lower()})
+
+    return rule
+
+
+async def get_rules_async() -> List[Rules]:
+    return await async_db.get_all("rules", {"_id": 0})
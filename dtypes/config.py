@@ -1,6 +1,51 @@
-from typing import TypedDict, List, Optional
+from typing import TypedDict, List, Optional, Dict, Any, NotRequired, Union
+
+
+class WriteConcernConfig(TypedDict, total=False):
+    w: Union[int, str]
+    j: bool
+    wtimeout: int
+
+
+class DatabaseClientConfig(TypedDict, total=False):
+    uri: str
+
+    # connection pool
+    max_pool_size: int
+    min_pool_size: int
+    max_idle_time_ms: int
+    wait_queue_timeout_ms: int
+
+    # timeouts
+    server_selection_timeout_ms: int
+    connect_timeout_ms: int
+    socket_timeout_ms: int
+
+    # wire compression, e.g. ["zstd", "snappy", "zlib"]
+    compressors: List[str]
+    zlib_compression_level: int
+
+    read_preference: str
+    app_name: str
+
+    # keyed by "collection" or "collection.operation"
+    write_concerns: Dict[str, WriteConcernConfig]
+
+
+class DatabaseConfig(DatabaseClientConfig, total=False):
+    # extra clients, each inheriting the settings above
+    clients: Dict[str, DatabaseClientConfig]
+
 
 class Config(TypedDict):
     token: str
     guild_id: str
-    database: str
\ No newline at end of file
+    # a MongoDB URI, or a DatabaseConfig
+    database: Union[str, DatabaseConfig]
+
+    # optional sections
+    storage: NotRequired[Dict[str, Any]]
+    hot_reload: NotRequired[bool]
+    reload_cogs: NotRequired[bool]
+    cache: NotRequired[Dict[str, Any]]
+    leveling: NotRequired[Dict[str, Any]]
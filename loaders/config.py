@@ -1,4 +1,5 @@
 import json
+import os
 from dtypes.config import Config
 from typing import TypedDict, List, Optional
 
@@ -7,11 +8,13 @@ class ConfigLoader:
         self.path = path
         self.data: Optional[List[Config]] = None
         self.has_error: bool = False
+        self.mtime: Optional[float] = None
 
     def load(self) -> None:
         """Loads and parses the JSON file at the specified path."""
         try:
             with open(self.path, 'r') as f:
+                self.mtime = os.fstat(f.fileno()).st_mtime
                 raw = json.load(f)
                 self.data = self._parse(raw)
         except FileNotFoundError:
@@ -37,18 +40,13 @@ class ConfigLoader:
         """
         # override default functionality if items provided
         if len(items_to_validate) > 0:
-            values = []
-            for item in items_to_validate:
-                if path: 
-                    self.path = path
-                    self.load()
+            if path and path != self.path:
+                self.path = path
+                self.load()
+            elif not self.data:
+                self.load()
 
-                values.append(self._has_value(item))
-            
-            if False in values:
-                return False
-            
-            return True
+            return all(self._has_value(item) for item in items_to_validate)
 
         # validate currently loaded data
         if self._has_value("token"):
@@ -74,4 +72,5 @@ class ConfigLoader:
         if isinstance(raw, dict):
             raw = [raw]
         
-        return [Config(token=entry.get("token", ""), guild_id=entry.get("guild_id", ""), database=entry.get("database", "")) for entry in raw]
+        # keep any optional sections alongside the required keys
+        return [Config(**{**entry, "token": entry.get("token", ""), "guild_id": entry.get("guild_id", ""), "database": entry.get("database", "")}) for entry in raw]
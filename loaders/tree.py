@@ -0,0 +1,31 @@
+import hashlib
+import json
+from typing import Optional
+
+from discord import app_commands
+
+
+def tree_hash(tree: app_commands.CommandTree) -> str:
+    """A stable hash of the global app-command payload that `tree.sync()` would send."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+def read_synced_hash(path: str) -> Optional[str]:
+    """Returns the hash recorded at the last successful sync, if any."""
+    try:
+        with open(path, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_synced_hash(path: str, value: str) -> None:
+    with open(path, "w") as f:
+        f.write(value)
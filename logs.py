@@ -0,0 +1,127 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+# attributes every LogRecord has, anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps log volume flat as traffic grows. Records below WARNING are sampled
+    at `sample_rate`, and anything below ERROR is limited to `rate_limit` per
+    second for each key. The key is the record's `operation` field if it has
+    one, otherwise its logger and message template. Errors always pass.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: float = 10.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+
+        # key -> (tokens, last refill)
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._suppressed: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+
+        key = (record.name, str(getattr(record, "operation", record.msg)))
+
+        with self._lock:
+            sampled = record.levelno < logging.WARNING and self.sample_rate < 1.0
+            if sampled and random.random() >= self.sample_rate:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+
+            now = time.monotonic()
+            tokens, last = self._buckets.get(key, (self.rate_limit, now))
+            tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now)
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+
+            self._buckets[key] = (tokens - 1.0, now)
+
+            # let the next record that gets through say how many were dropped
+            suppressed = self._suppressed.pop(key, 0)
+            if suppressed:
+                record.suppressed = suppressed
+
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread as-is. The stock handler formats the
+    message before queueing it, which would keep that cost on the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    structured: bool = False,
+    sample_rate: float = 1.0,
+    rate_limit: float = 10.0,
+) -> QueueListener:
+    """
+    Routes all logging through a queue that a background thread drains to
+    stderr. Returns the listener, call `stop()` on it to flush at shutdown.
+    """
+    output = logging.StreamHandler()
+    output.setFormatter(
+        StructuredFormatter()
+        if structured
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate=sample_rate, rate_limit=rate_limit))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [handler]
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+
+    return listener
+
+
+def level_from_name(name: Optional[str], default: int = logging.INFO) -> int:
+    level = logging.getLevelName(str(name).upper()) if name else default
+    return level if isinstance(level, int) else default
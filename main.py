@@ -1,23 +1,50 @@
-from typing import Coroutine, Any, List, Dict
+from typing import Coroutine, Any, List, Dict, Optional, Set
 from dtypes.collections.profile import (
-    CommunityProfile,
-    find_profile_by_id,
-    save,
-    update_profile_by_id,
+    ProfileRecord,
+    async_db,
+    get_or_create_profile_async,
+    migrate_levels_async,
 )
+from dtypes.collections.colors import set_color_role_async
+from dtypes.collections.indexes import ensure_indexes, verify_query_plans
 
+import asyncio
 import glob
 import importlib.util
+import os
+import signal
+import time
 from datetime import datetime
+from types import ModuleType
 
 import discord
 from discord.ext import commands
 
-from config import get_config_or_throw
+from config import get_config_or_throw, settings
+from logs import level_from_name, setup_logging
+from cache.profile import ProfileCache, profile_cache
+from cache.colors import color_catalog
+from cache.roles import role_index
+from cache.rules import rule_index
+from cache.leaderboard import leaderboard
+from cache.snapshot import CacheSnapshotter
+from services.leveling import XPAccumulator, XPLimiter
+from services.ingest import IngestPipeline
+from services.warmup import ProfileWarmup
+from loaders.tree import read_synced_hash, tree_hash, write_synced_hash
+from services.metrics import MetricsServer
+from services.instrumentation import InstrumentedTree, gateway_events, shard_of
+from services.bus import BusClient
 
 
 class HyperLands(commands.AutoShardedBot):
-    def __init__(self, shard_count: int = None, **kwargs) -> None:
+    def __init__(
+        self,
+        shard_count: int = None,
+        bus: Optional[BusClient] = None,
+        worker_id: int = 0,
+        **kwargs,
+    ) -> None:
         intents = discord.Intents.default()
         intents.message_content = True
         # intents.presences = True
@@ -25,128 +52,471 @@ class HyperLands(commands.AutoShardedBot):
 
         self.commands_directory = "./commands"
         self.commands_loaded = []
+        self.cog_timings: Dict[str, float] = {}
 
-        # check in this list for loaded profiles before
+        # per cog module: its file, the file's mtime when loaded, and the cogs its setup() added
+        self.cog_paths: Dict[str, str] = {}
+        self.cog_mtimes: Dict[str, float] = {}
+        self.module_cogs: Dict[str, List[str]] = {}
+        self._reload_lock = asyncio.Lock()
+
+        # hash of the command tree at the last sync, so unchanged trees aren't resynced
+        self.tree_hash_path = settings.get_str("tree_hash_path", "./.tree_hash")
+
+        # check this cache for loaded profiles before
         # querying the database to save on requests
-        self.cached_profiles: List[CommunityProfile] = []
+        self.cached_profiles: ProfileCache = profile_cache
+
+        # written periodically so a restart starts with warm caches, one file per worker
+        snapshot_path = settings.get_str("cache.snapshot_path", "./.cache_snapshot")
+        self.snapshots = CacheSnapshotter(
+            self.cached_profiles,
+            color_catalog,
+            snapshot_path if worker_id == 0 else f"{snapshot_path}.{worker_id}",
+            interval=settings.get_float("cache.snapshot_interval", 300.0),
+            max_age=settings.get_float("cache.snapshot_max_age", 3600.0),
+            batch_size=settings.get_int("cache.warmup_batch_size", 500),
+        )
+
+        # loads known members' profiles in the background once the bot is ready
+        self.warmup = ProfileWarmup(
+            self.cached_profiles,
+            batch_size=settings.get_int("cache.warmup_batch_size", 500),
+            concurrency=settings.get_int("cache.warmup_concurrency", 2),
+            progress=lambda done, total: print(f"cache - warmed {done}/{total} member profiles"),
+        )
+
+        # xp is buffered in memory and written out in bulk
+        self.xp = XPAccumulator(
+            flush_interval=settings.get_float("leveling.flush_interval", 10.0),
+            max_pending=settings.get_int("leveling.max_pending", 500),
+        )
+
+        # only some messages earn xp, the rest skip the database entirely
+        self.xp_limiter = XPLimiter(
+            burst=settings.get_int("leveling.xp_burst", 3),
+            refill=settings.get_float("leveling.xp_refill", 20.0),
+        )
+
+        # message handling runs off the gateway dispatch, partitioned by author
+        self.ingest = IngestPipeline(
+            self.handle_message,
+            workers=settings.get_int("ingest.workers", 4),
+            max_size=settings.get_int("ingest.max_size", 1000),
+            policy=settings.get_str("ingest.policy", "drop_oldest"),
+            max_waiting=settings.get("ingest.max_waiting"),
+        )
+
+        # set when running as one worker of a cluster, see cluster.py
+        self.bus = bus
+        self.worker_id = worker_id
+
+        self.metrics = MetricsServer(
+            host=settings.get_str("metrics.host", "127.0.0.1"),
+            port=settings.get_int("metrics.port", 9108) + worker_id,
+        )
+
+        settings.subscribe(self.on_config_change)
 
         super().__init__(
-            command_prefix="hl!", intents=intents, shard_count=shard_count, **kwargs
+            command_prefix="hl!",
+            intents=intents,
+            shard_count=shard_count,
+            tree_cls=InstrumentedTree,
+            **kwargs,
         )
 
+    @staticmethod
+    def _import_cog(module_name: str, path: str) -> ModuleType:
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+
+        return mod
+
+    async def _timed_import(self, module_name: str, path: str) -> ModuleType:
+        started = time.perf_counter()
+        try:
+            return await asyncio.to_thread(self._import_cog, module_name, path)
+        finally:
+            self.cog_timings[module_name] = time.perf_counter() - started
+
+    @staticmethod
+    def _module_name(path: str) -> str:
+        return path.replace("/", ".").replace("\\", ".").removesuffix(".py")
+
+    def _cog_files(self) -> List[str]:
+        return sorted(glob.glob(f"{self.commands_directory}/**/*.py", recursive=True))
+
+    async def _setup_cog(self, module_name: str, path: str, mod: ModuleType) -> None:
+        """Runs a cog module's setup() and records which cogs it added."""
+        before = set(self.cogs)
+        self.cog_paths[module_name] = path
+        self.cog_mtimes[module_name] = os.path.getmtime(path)
+
+        if hasattr(mod, "setup"):
+            try:
+                await mod.setup(self)
+            finally:
+                self.module_cogs[module_name] = [name for name in self.cogs if name not in before]
+
+            command = module_name.split(".")[-1]
+            if command not in self.commands_loaded:
+                self.commands_loaded.append(command)
+
     async def setup_cogs(self) -> Coroutine[Any, Any, Coroutine]:
-        commands = glob.glob(f"{self.commands_directory}/**/*.py", recursive=True)
+        commands = self._cog_files()
+        module_names = [self._module_name(command) for command in commands]
 
-        for command in commands:
-            module_name = (
-                command.replace("/", ".").replace("\\", ".").removesuffix(".py")
-            )
+        # import every cog module at once, then register them in a stable order
+        modules = await asyncio.gather(
+            *(self._timed_import(module_name, command) for module_name, command in zip(module_names, commands)),
+            return_exceptions=True,
+        )
 
+        for module_name, command, mod in zip(module_names, commands, modules):
             try:
-                spec = importlib.util.spec_from_file_location(module_name, command)
-                mod = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mod)
+                if isinstance(mod, BaseException):
+                    raise mod
 
-                if hasattr(mod, "setup"):
-                    await mod.setup(self)
-                    self.commands_loaded.append(module_name.split(".")[-1])
+                await self._setup_cog(module_name, command, mod)
 
             except Exception as e:
                 print(f"Error loading command {module_name}: {e}")
                 continue
 
+        for module_name, elapsed in sorted(self.cog_timings.items(), key=lambda timing: -timing[1]):
+            print(f"cogs - imported {module_name} in {elapsed * 1000:.1f}ms")
+
+    def changed_cogs(self) -> List[str]:
+        """Cog modules whose file was added, edited or removed since it was last loaded."""
+        files = {self._module_name(path): path for path in self._cog_files()}
+        changed = [
+            module_name
+            for module_name, path in files.items()
+            if self.cog_mtimes.get(module_name) != os.path.getmtime(path)
+        ]
+        removed = [module_name for module_name in self.cog_paths if module_name not in files]
+
+        return changed + removed
+
+    async def _unload_cogs(self, module_name: str) -> List[commands.Cog]:
+        removed = []
+        for name in self.module_cogs.pop(module_name, []):
+            cog = await self.remove_cog(name)
+            if cog is not None:
+                removed.append(cog)
+        return removed
+
+    async def reload_cog(self, module_name: str) -> bool:
+        """
+        Re-imports one cog module and swaps its cogs in place, leaving every
+        other cog, the caches and the gateway connections alone. If the new
+        version fails to import or set up, the old cogs are put back. The
+        tree is only synced if the reload changed it. Returns True on success.
+        """
+        async with self._reload_lock:
+            path = self.cog_paths.get(module_name) or next(
+                (path for path in self._cog_files() if self._module_name(path) == module_name), None
+            )
+
+            if path is None or not os.path.exists(path):
+                # the file is gone, so are its commands
+                await self._unload_cogs(module_name)
+                self.cog_paths.pop(module_name, None)
+                self.cog_mtimes.pop(module_name, None)
+                command = module_name.split(".")[-1]
+                if command in self.commands_loaded:
+                    self.commands_loaded.remove(command)
+                print(f"cogs - unloaded {module_name}")
+            else:
+                try:
+                    mod = await self._timed_import(module_name, path)
+                except Exception as e:
+                    # remember the broken version so the watcher doesn't retry it until it changes again
+                    self.cog_mtimes[module_name] = os.path.getmtime(path)
+                    print(f"error - could not import {module_name}, keeping the loaded version: {e}")
+                    return False
+
+                previous = await self._unload_cogs(module_name)
+                try:
+                    await self._setup_cog(module_name, path, mod)
+                except Exception as e:
+                    # roll back to the cogs that were running before
+                    await self._unload_cogs(module_name)
+                    for cog in previous:
+                        await self.add_cog(cog, override=True)
+                    self.module_cogs[module_name] = [cog.qualified_name for cog in previous]
+
+                    print(f"error - could not set up {module_name}, restored the loaded version: {e}")
+                    return False
+
+                print(f"cogs - reloaded {module_name} in {self.cog_timings[module_name] * 1000:.1f}ms")
+
+            # the command tree is global, one worker syncing it is enough
+            if self.worker_id == 0:
+                await self.sync_tree()
+            return True
+
+    async def reload_changed_cogs(self) -> List[str]:
+        """Reloads every changed cog module. Returns the ones that reloaded."""
+        return [module_name for module_name in self.changed_cogs() if await self.reload_cog(module_name)]
+
+    async def watch_cogs(self, interval: float = 2.0) -> None:
+        """Polls the commands directory for changed cogs forever."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_changed_cogs()
+            except Exception as e:
+                print(f"error - cog watcher failed: {e}")
+
+    async def sync_tree(self, force: bool = False) -> bool:
+        """Syncs the command tree if it changed since the last sync. Returns True if it synced."""
+        current = tree_hash(self.tree)
+
+        if not force and read_synced_hash(self.tree_hash_path) == current:
+            print("cogs - command tree unchanged, skipping sync")
+            return False
+
+        await self.tree.sync()
+        write_synced_hash(self.tree_hash_path, current)
+        return True
+
+    async def start(self, *args: Any, **kwargs: Any) -> None:
+        # SIGTERM cancels the task running the bot, so `close()` still runs before
+        # the loop ends, the same as on Ctrl+C. cluster.py stops workers this way.
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, self._on_sigterm, asyncio.current_task()
+            )
+        except NotImplementedError:
+            # no signal handlers on windows' event loop
+            pass
+
+        await super().start(*args, **kwargs)
+
+    def _on_sigterm(self, task: asyncio.Task) -> None:
+        if not self.is_closed():
+            print("hyperlands - received SIGTERM, shutting down")
+            task.cancel()
+
     async def setup_hook(self) -> None:
+        await asyncio.to_thread(ensure_indexes)
+        if settings.get_bool("verify_indexes"):
+            await asyncio.to_thread(verify_query_plans)
+
+        snapshot = self.snapshots.restore() if settings.get_bool("cache.snapshot", True) else None
+        if snapshot is not None:
+            print(f"cache - restored {len(snapshot.profiles)} profiles and {len(snapshot.colors)} colors from snapshot")
+            self.snapshot_reconcile = asyncio.create_task(self.reconcile_snapshot())
+            self.snapshot_colors = asyncio.create_task(self.refresh_restored_colors())
+        else:
+            await color_catalog.refresh()
+        await rule_index.refresh()
+
+        migrated = await migrate_levels_async()
+        if migrated:
+            print(f"database - converted {migrated} string levels to numbers")
+        await leaderboard.refresh()
+
         await self.setup_cogs()
-        await self.tree.sync()
+        # the command tree is global, one worker syncing it is enough
+        if self.worker_id == 0:
+            await self.sync_tree(force=settings.get_bool("force_sync"))
         print(self.commands_loaded)
 
+        self.xp.start()
+        self.xp_limiter.start()
+        if settings.get_bool("cache.snapshot", True):
+            self.snapshots.start()
+        self.ingest.start()
 
-if __name__ == "__main__":
-    service = HyperLands(shard_count=2)
+        if settings.get_bool("hot_reload"):
+            self.config_watcher = asyncio.create_task(settings.watch())
+
+        if settings.get_bool("reload_cogs"):
+            self.cog_watcher = asyncio.create_task(
+                self.watch_cogs(settings.get_float("reload_cogs_interval", 2.0))
+            )
+
+        if settings.get_bool("metrics.enabled"):
+            await self.metrics.start()
+
+        if self.bus is not None:
+            self.attach_bus()
+
+    async def reconcile_snapshot(self) -> None:
+        try:
+            refreshed = await self.snapshots.reconcile()
+            print(f"cache - refreshed {refreshed} profiles changed since the snapshot")
+        except Exception as e:
+            print(f"error - could not reconcile the cache snapshot, {e}")
+
+    async def refresh_restored_colors(self) -> None:
+        # the restored catalog may be out of date, keep trying until the database answers
+        delay = 5.0
+        while True:
+            try:
+                await color_catalog.refresh()
+                print(f"cache - refreshed {len(color_catalog)} colors after restoring the snapshot")
+                return
+            except Exception as e:
+                print(f"error - could not refresh colors after restoring the snapshot, retrying in {delay:.0f}s, {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 300.0)
+
+    def publish(self, topic: str, payload: Any = None) -> None:
+        """Tells the other cluster workers about a change. Does nothing outside a cluster."""
+        if self.bus is not None:
+            self.bus.publish(topic, payload)
+
+    def attach_bus(self) -> None:
+        # changes made by other workers
+        self.bus.subscribe(
+            "profile.invalidate",
+            lambda user_id: self.cached_profiles.invalidate(user_id, broadcast=False),
+        )
+        self.bus.subscribe("xp.flushed", self.on_remote_xp_flush)
+        self.bus.subscribe("colors.changed", lambda _: color_catalog.refresh())
+        self.bus.subscribe("rules.changed", lambda _: rule_index.refresh())
+
+        # changes made here
+        self.cached_profiles.listeners.append(
+            lambda user_id: self.publish("profile.invalidate", user_id)
+        )
+        self.xp.listeners.append(
+            lambda batch: self.publish("xp.flushed", {"deltas": batch, "cap": self.xp.cap})
+        )
+
+        self.bus.start()
 
-    @service.event
-    async def on_message(message: discord.Message) -> None:
-        # search for
-        # print(message.author.id)
+    def on_remote_xp_flush(self, payload: Dict[str, Any]) -> None:
+        for user_id, amount in payload["deltas"].items():
+            self.cached_profiles.add_level(user_id, amount, payload["cap"])
+            leaderboard.add(user_id, amount, payload["cap"])
 
+    def on_config_change(self, changed: Set[str]) -> None:
+        if "leveling" in changed:
+            self.xp.flush_interval = settings.get_float("leveling.flush_interval", 10.0)
+            self.xp.max_pending = settings.get_int("leveling.max_pending", 500)
+            self.xp_limiter.burst = settings.get_int("leveling.xp_burst", 3)
+            self.xp_limiter.refill = settings.get_float("leveling.xp_refill", 20.0)
+
+    async def on_ready(self) -> None:
+        if settings.get_bool("cache.warmup", True):
+            self.warmup.start(
+                member.id for guild in self.guilds for member in guild.members if not member.bot
+            )
+
+    async def close(self) -> None:
+        await super().close()
+        await self.warmup.stop()
+        await self.ingest.stop()
+        await self.xp.stop()
+        await self.xp_limiter.stop()
+        if settings.get_bool("cache.snapshot", True):
+            await self.snapshots.stop()
+        await self.metrics.stop()
+        if self.bus is not None:
+            await self.bus.stop()
+        async_db.shutdown()
+
+    def dispatch(self, event_name: str, /, *args: Any, **kwargs: Any) -> None:
+        shard_id = shard_of(*args)
+        gateway_events.inc(event=event_name, shard="none" if shard_id is None else shard_id)
+
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def on_guild_available(self, guild: discord.Guild) -> None:
+        role_index.load(guild)
+
+        # colors saved before role ids were stored get theirs from the role of the same name
+        backfilled = 0
+        for color in color_catalog:
+            if color.role_id is None:
+                role = role_index.find(guild, color.name)
+                if role is not None:
+                    await set_color_role_async(color.name, role.id)
+                    backfilled += 1
+
+        if backfilled:
+            print(f"database - stored role ids for {backfilled} colors")
+            await color_catalog.refresh()
+            self.publish("colors.changed")
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        role_index.forget(guild)
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        role_index.add(role)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        role_index.update(before, after)
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        role_index.remove(role)
+
+    async def on_app_command_completion(
+        self, interaction: discord.Interaction, command: discord.app_commands.Command
+    ) -> None:
+        self.tree.observe(interaction, "ok")
+
+    async def on_message(self, message: discord.Message) -> None:
         if message.author.bot:
             return
 
-        _user: CommunityProfile = None
-
-        if len(service.cached_profiles) > 0:
-            for profile in service.cached_profiles:
-                if not profile.get("user_id") == str(
-                    message.author.id
-                ):  # couldn't find in cache
-
-                    _user: CommunityProfile = find_profile_by_id(str(message.author.id))
-
-                    if _user is not None and _user not in service.cached_profiles:
-                        # we couldn't find the profile in cached profiles, but it exists in the database, so cache it
-                        service.cached_profiles.append(_user)
-                        print(
-                            "database - profile found but isn't cached. Caching... [0]"
-                        )
-                        continue
-
-                    # we could not find the profile in cached or database, so make a new profile
-                    new_user: CommunityProfile = {
-                        "user_id": str(message.author.id),
-                        "color": "default",
-                        "level": 0,
-                        "name": str(message.author.name),
-                        "nickname": str(message.author.global_name),
-                        "timestamp": datetime.now(),
-                    }
-
-                    if not find_profile_by_id(str(message.author.id)):
-                        save(new_user)
-                        service.cached_profiles.append(new_user)
-                        print("database - new profile found, saving... [1]")
-
-                # the profile is in cached profiles,
-                # which means they have a profile
-                # don't do anything
-                continue
+        # messages that can't earn xp right now don't need any database work
+        if not self.xp_limiter.allow(message.author.id):
+            return
 
-        _user = find_profile_by_id(str(message.author.id))
+        await self.ingest.submit(message.author.id, message)
+
+    async def handle_message(self, message: discord.Message) -> None:
+        user_id = str(message.author.id)
+        _user: ProfileRecord = self.cached_profiles.get(user_id)
+
+        if _user is None:
+            # a single upsert either finds the profile or creates a new one
+            _user = await get_or_create_profile_async(
+                {
+                    "user_id": user_id,
+                    "color": "default",
+                    "level": 0,
+                    "name": str(message.author.name),
+                    "nickname": str(message.author.global_name),
+                    "timestamp": datetime.now(),
+                }
+            )
 
-        if _user is not None:
-            print("database - profile found but isn't cached. Caching... [1]")
-            service.cached_profiles.append(_user)
-        else:
-            # we could not find the profile in cached or database, so make a new profile
-            new_user: CommunityProfile = {
-                "user_id": str(message.author.id),
-                "color": "default",
-                "level": 0,
-                "name": str(message.author.name),
-                "nickname": str(message.author.global_name),
-                "timestamp": datetime.now(),
-            }
-
-            save(new_user)
-            service.cached_profiles.append(new_user)
-            print("database - new profile found, saving... [0]")
+            print("database - profile isn't cached. Caching... [0]")
+            self.cached_profiles.put(user_id, _user)
 
         # leveling system
         # 5xp per message
+        self.xp.add(user_id, 5)
 
-        usr: CommunityProfile = find_profile_by_id(str(message.author.id))
-
-        if usr:
-            update_profile_by_id(
-                str(message.author.id),
-                "level",
-                str(
-                    usr.get("level") + 5
-                    if not (usr.get("level") + 5 >= 1000)
-                    else usr.get("level")
-                )
-                + "/1000",
-            )
 
-        return
+def run(**kwargs: Any) -> None:
+    """Sets up logging and runs the bot until it is closed. `kwargs` go to `HyperLands`."""
+    log_listener = setup_logging(
+        level=level_from_name(settings.get("logging.level")),
+        structured=settings.get_bool("logging.structured"),
+        sample_rate=settings.get_float("logging.sample_rate", 1.0),
+        rate_limit=settings.get_float("logging.rate_limit", 10.0),
+    )
 
-    service.run(get_config_or_throw("token"))
+    service = HyperLands(**kwargs)
+
+    try:
+        # logging is already set up above, don't let discord.py add its own handler
+        service.run(get_config_or_throw("token"), log_handler=None)
+    except asyncio.CancelledError:
+        # stopped by SIGTERM, the bot has already closed
+        pass
+    finally:
+        log_listener.stop()
+
+
+if __name__ == "__main__":
+    run(shard_count=2)
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Union[None, Awaitable[None]]]
+
+
+class BusHub:
+    """
+    Local message bus between cluster workers, served on a Unix socket.
+
+    Every message is a line of JSON, and each one is relayed to every other
+    connected worker. The hub doesn't look inside messages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info("Bus listening on %s", self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                for other in list(self._writers):
+                    if other is not writer:
+                        other.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for writer in list(self._writers):
+            writer.close()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class BusClient:
+    """A worker's connection to the `BusHub`. Reconnects on its own if the hub goes away."""
+
+    def __init__(self, path: str, reconnect_delay: float = 1.0):
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, payload: Any = None) -> None:
+        """Sends a message to every other worker. Dropped if the hub isn't connected."""
+        if self._writer is None or self._writer.is_closing():
+            logger.warning("Bus not connected, dropping %s", topic, extra={"operation": "bus_publish"})
+            return
+
+        message = {"topic": topic, "payload": payload, "sender": os.getpid()}
+        self._writer.write(json.dumps(message).encode() + b"\n")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                logger.info("Connected to bus at %s", self.path)
+
+                while line := await reader.readline():
+                    try:
+                        message = json.loads(line)
+                    except ValueError as e:
+                        logger.error("Ignoring malformed bus message: %s", e, extra={"operation": "bus_receive"})
+                        continue
+
+                    if isinstance(message, dict):
+                        await self._dispatch(message)
+            # OSError covers refused, missing or unreadable sockets, ValueError a line over the stream limit
+            except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+                logger.warning("Bus connection lost: %s", e, extra={"operation": "bus_connect"})
+            finally:
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _dispatch(self, message: Dict[str, Any]) -> None:
+        for handler in self._handlers.get(message.get("topic"), []):
+            try:
+                result = handler(message.get("payload"))
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error("Bus handler for %s failed: %s", message.get("topic"), e)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
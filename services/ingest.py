@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ingest_depth = registry.gauge("hyperlands_ingest_queue_depth", "Events waiting in each ingest partition.")
+ingest_lag = registry.histogram(
+    "hyperlands_ingest_lag_seconds", "Time an event waited in the ingest queue before a worker picked it up."
+)
+ingest_seconds = registry.histogram("hyperlands_ingest_seconds", "Time spent handling an ingested event.")
+ingest_dropped = registry.counter("hyperlands_ingest_dropped_total", "Events shed because the ingest queue was full.")
+ingest_errors = registry.counter("hyperlands_ingest_errors_total", "Ingested events whose handler raised.")
+
+# what to do with a new event when its partition is full
+POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class IngestPipeline:
+    """
+    Bounded queue between gateway dispatch and the work done per event.
+
+    Events are split over `workers` partitions by key (the user id for
+    messages), each with its own queue and worker, so one user's events are
+    handled in order while a slow database only stalls the partition it is
+    in. Each partition holds at most `max_size // workers` events; past that
+    `policy` decides between waiting for room (`block`), discarding the new
+    event (`drop_newest`) or discarding the oldest queued one (`drop_oldest`).
+
+    discord.py runs every event handler in its own task, so waiting for room
+    doesn't slow dispatch down, it only parks the handler's task. `block`
+    therefore lets at most `max_waiting` submitters wait per partition and
+    sheds events past that, which keeps memory bounded.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int = 4,
+        max_size: int = 1000,
+        policy: str = "drop_oldest",
+        max_waiting: Optional[int] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown ingest policy {policy!r}, expected one of {', '.join(POLICIES)}")
+
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self.policy = policy
+        # defaults to one partition's worth of events
+        self.max_waiting = max_waiting
+
+        self._queues: List[asyncio.Queue] = []
+        self._waiting: List[int] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def _partition(self, key: Any) -> int:
+        return (int(key) if isinstance(key, int) or str(key).isdigit() else hash(key)) % self.workers
+
+    async def submit(self, key: Any, event: Any) -> bool:
+        """Queues `event` on `key`'s partition. Returns False if the event was dropped."""
+        if not self._queues:
+            raise RuntimeError("IngestPipeline.submit called before start()")
+
+        partition = self._partition(key)
+        queue = self._queues[partition]
+        item: Tuple[float, Any] = (time.perf_counter(), event)
+
+        if queue.full():
+            if self.policy == "drop_newest":
+                ingest_dropped.inc(policy=self.policy)
+                return False
+
+            if self.policy == "drop_oldest":
+                queue.get_nowait()
+                queue.task_done()
+                ingest_dropped.inc(policy=self.policy)
+
+            if self.policy == "block":
+                max_waiting = queue.maxsize if self.max_waiting is None else self.max_waiting
+                if self._waiting[partition] >= max_waiting:
+                    ingest_dropped.inc(policy=self.policy)
+                    return False
+
+                self._waiting[partition] += 1
+                try:
+                    await queue.put(item)
+                finally:
+                    self._waiting[partition] -= 1
+
+                ingest_depth.set(queue.qsize(), partition=partition)
+                return True
+
+        await queue.put(item)
+        ingest_depth.set(queue.qsize(), partition=partition)
+        return True
+
+    async def _work(self, partition: int) -> None:
+        queue = self._queues[partition]
+
+        while True:
+            enqueued, event = await queue.get()
+            ingest_depth.set(queue.qsize(), partition=partition)
+
+            started = time.perf_counter()
+            ingest_lag.observe(started - enqueued)
+
+            try:
+                await self.handler(event)
+            except Exception as e:
+                ingest_errors.inc()
+                logger.error("Ingest handler failed: %s", e, exc_info=True, extra={"operation": "ingest"})
+            finally:
+                ingest_seconds.observe(time.perf_counter() - started)
+                queue.task_done()
+
+    def depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+
+        size = max(1, self.max_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=size) for _ in range(self.workers)]
+        self._waiting = [0] * self.workers
+        self._tasks = [asyncio.create_task(self._work(partition)) for partition in range(self.workers)]
+
+    async def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Lets the workers finish what is queued, up to `timeout` seconds, then stops them."""
+        if not self._tasks:
+            return
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %s events still queued", self.depth(), extra={"operation": "ingest"})
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
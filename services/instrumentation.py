@@ -0,0 +1,48 @@
+import time
+from typing import Any, Optional, Union
+
+import discord
+from discord import app_commands
+
+from services.metrics import registry
+
+command_seconds = registry.histogram(
+    "hyperlands_app_command_seconds", "Time from receiving an app command to it finishing."
+)
+gateway_events = registry.counter(
+    "hyperlands_gateway_events_total", "Gateway events dispatched, per shard."
+)
+
+
+def shard_of(*args: Any) -> Optional[int]:
+    """Best effort shard id for an event, taken from the first argument that belongs to a guild."""
+    for arg in args:
+        guild = arg if isinstance(arg, discord.Guild) else getattr(arg, "guild", None)
+        if isinstance(guild, discord.Guild):
+            return guild.shard_id
+    return None
+
+
+def _command_name(command: Union[app_commands.Command, app_commands.ContextMenu, None]) -> str:
+    return command.qualified_name if command is not None else "unknown"
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """Command tree that records how long every app command takes, and whether it failed."""
+
+    async def interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+    def observe(self, interaction: discord.Interaction, status: str) -> None:
+        started = interaction.extras.get("started")
+        if started is None:
+            return
+
+        command_seconds.observe(
+            time.perf_counter() - started, command=_command_name(interaction.command), status=status
+        )
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError, /) -> None:
+        self.observe(interaction, "error")
+        await super().on_error(interaction, error)
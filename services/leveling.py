@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dtypes.collections.profile import add_levels_async
+from cache.profile import profile_cache
+from cache.leaderboard import leaderboard
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+xp_limited = registry.counter("hyperlands_xp_limited_total", "Messages that earned no XP because of the rate limit.")
+
+
+class XPLimiter:
+    """
+    Per-user token bucket deciding which messages earn XP.
+
+    Each user holds up to `burst` tokens, refilled at one per `refill`
+    seconds, and a message earns XP only if it can take a token. Buckets are
+    spread over `shards` dicts by user id so compaction only walks one shard
+    at a time; a bucket that has refilled completely is the same as no
+    bucket, so compaction simply drops it.
+    """
+
+    def __init__(self, burst: int = 3, refill: float = 20.0, shards: int = 16, compact_interval: float = 60.0):
+        self.burst = burst
+        self.refill = refill
+        self.compact_interval = compact_interval
+
+        # user id -> (tokens, last refill)
+        self._shards: List[Dict[int, Tuple[float, float]]] = [{} for _ in range(shards)]
+        self._task: Optional[asyncio.Task] = None
+
+    def allow(self, user_id: int, now: Optional[float] = None) -> bool:
+        """Takes a token for `user_id` if one is available."""
+        user_id = int(user_id)
+        now = time.monotonic() if now is None else now
+        shard = self._shards[user_id % len(self._shards)]
+
+        tokens, updated = shard.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) / self.refill)
+
+        if tokens < 1:
+            shard[user_id] = (tokens, now)
+            xp_limited.inc()
+            return False
+
+        shard[user_id] = (tokens - 1, now)
+        return True
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Drops buckets that have refilled completely. Returns how many were dropped."""
+        now = time.monotonic() if now is None else now
+        dropped = 0
+
+        for shard in self._shards:
+            full = [
+                user_id
+                for user_id, (tokens, updated) in shard.items()
+                if tokens + (now - updated) / self.refill >= self.burst
+            ]
+            for user_id in full:
+                del shard[user_id]
+            dropped += len(full)
+
+        return dropped
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            self.compact()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class XPAccumulator:
+    """
+    Write-behind buffer for XP.
+
+    Messages only add to an in-memory per-user delta. The deltas are written
+    out as one bulk `$inc` every `flush_interval` seconds, or sooner once
+    `max_pending` users are waiting to be flushed.
+    """
+
+    def __init__(self, flush_interval: float = 10.0, max_pending: int = 500, cap: int = 1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.cap = cap
+
+        self._pending: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._threshold_flush: Optional[asyncio.Task] = None
+
+        # called with each batch after it is written
+        self.listeners: List[Callable[[Dict[str, int]], None]] = []
+
+    def add(self, user_id: str, amount: int) -> None:
+        """Queues `amount` XP for `user_id`."""
+        user_id = str(user_id)
+        self._pending[user_id] = self._pending.get(user_id, 0) + amount
+
+        if len(self._pending) >= self.max_pending and (
+            self._threshold_flush is None or self._threshold_flush.done()
+        ):
+            self._threshold_flush = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Writes all pending deltas. Returns the number of users flushed."""
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+
+            try:
+                await add_levels_async(batch, self.cap)
+            except Exception as e:
+                # put the deltas back so the next flush retries them
+                for user_id, amount in batch.items():
+                    self._pending[user_id] = self._pending.get(user_id, 0) + amount
+                logger.error("Failed to flush XP for %s users: %s", len(batch), e, extra={"operation": "xp_flush"})
+                return 0
+
+            # cached profiles and the leaderboard mirror the server-side increment
+            for user_id, amount in batch.items():
+                profile_cache.add_level(user_id, amount, self.cap)
+                leaderboard.add(user_id, amount, self.cap)
+
+            for listener in self.listeners:
+                listener(batch)
+
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the flush loop and writes out anything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Collection, Dict, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("member", "role", "group", "reason", "waiters")
+
+    def __init__(self, member: discord.Member, role: discord.Role, group: Collection[int], reason: Optional[str]):
+        self.member = member
+        self.role = role
+        self.group = group
+        self.reason = reason
+        self.waiters: List[asyncio.Future] = []
+
+
+class RoleReconciler:
+    """
+    Gives a member exactly one role out of a group (e.g. the color roles) with
+    a single `member.edit(roles=...)`, instead of an `add_roles` call plus one
+    `remove_roles` call per stale role.
+
+    Requests for a member that arrive while an edit for them is in flight are
+    coalesced: only the most recent one is applied, once the current edit
+    finishes, and every caller gets that result.
+
+    Member edits are rate limited per guild (`PATCH /guilds/{guild_id}/members/{member_id}`
+    shares a bucket on `guild_id`), so at most `per_guild` edits run at once
+    in each guild rather than queueing inside discord.py's HTTP client.
+    """
+
+    def __init__(self, per_guild: int = 1):
+        self.per_guild = per_guild
+
+        self._pending: Dict[Tuple[int, int], _Request] = {}
+        self._workers: Dict[Tuple[int, int], asyncio.Task] = {}
+        self._buckets: Dict[int, asyncio.Semaphore] = {}
+
+    async def set_exclusive(
+        self,
+        member: discord.Member,
+        role: discord.Role,
+        group: Collection[int],
+        reason: Optional[str] = None,
+    ) -> bool:
+        """
+        Gives `member` `role` and takes away every other role whose id is in
+        `group`. Returns whether the member's roles had to change.
+        """
+        key = (member.guild.id, member.id)
+
+        # a newer request replaces one that hasn't been applied yet
+        request = _Request(member, role, group, reason)
+        previous = self._pending.get(key)
+        if previous is not None:
+            request.waiters = previous.waiters
+        self._pending[key] = request
+
+        waiter = asyncio.get_running_loop().create_future()
+        request.waiters.append(waiter)
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+
+        return await waiter
+
+    @staticmethod
+    def target_roles(member: discord.Member, role: discord.Role, group: Collection[int]) -> List[discord.Role]:
+        """The member's roles with every role in `group` except `role` removed."""
+        roles = [r for r in member.roles if not r.is_default() and (r.id == role.id or r.id not in group)]
+        if role not in roles:
+            roles.append(role)
+        return roles
+
+    async def _drain(self, key: Tuple[int, int]) -> None:
+        try:
+            while key in self._pending:
+                request = self._pending.pop(key)
+
+                try:
+                    result = await self._apply(request)
+                except Exception as e:
+                    logger.error(
+                        "Failed to reconcile roles for %s: %s", key[1], e, extra={"operation": "role_edit"}
+                    )
+                    for waiter in request.waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                    continue
+
+                for waiter in request.waiters:
+                    if not waiter.done():
+                        waiter.set_result(result)
+        finally:
+            del self._workers[key]
+
+    async def _apply(self, request: _Request) -> bool:
+        member = request.member
+        target = self.target_roles(member, request.role, request.group)
+        if {r.id for r in target} == {r.id for r in member.roles if not r.is_default()}:
+            return False
+
+        bucket = self._buckets.setdefault(member.guild.id, asyncio.Semaphore(self.per_guild))
+        async with bucket:
+            await member.edit(roles=target, reason=request.reason)
+
+        return True
+
+
+role_reconciler = RoleReconciler()
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Iterable, List, Optional
+
+from cache.profile import ProfileCache
+from dtypes.collections.profile import find_profiles_by_ids_async
+
+logger = logging.getLogger(__name__)
+
+Progress = Callable[[int, int], None]
+
+
+class ProfileWarmup:
+    """
+    Fills the profile cache for members the bot already knows about, so their
+    first message after a restart doesn't go to the database.
+
+    Ids are loaded `batch_size` at a time with one `$in` query per batch, with
+    at most `concurrency` batches in flight. `progress` is called with the
+    number of ids looked up so far and the total after every batch.
+    """
+
+    def __init__(
+        self,
+        cache: ProfileCache,
+        batch_size: int = 500,
+        concurrency: int = 2,
+        progress: Optional[Progress] = None,
+    ):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.progress = progress
+
+        self.done = 0
+        self.total = 0
+        self.loaded = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load(self, batch: List[str], limit: asyncio.Semaphore) -> None:
+        async with limit:
+            try:
+                profiles = await find_profiles_by_ids_async(batch, self.batch_size)
+            except Exception as e:
+                logger.error("Failed to warm %s profiles: %s", len(batch), e, extra={"operation": "warmup"})
+                profiles = []
+
+        for profile in profiles:
+            # something newer may have been cached while the batch was loading
+            if profile.user_id not in self.cache:
+                self.cache.put(profile.user_id, profile)
+                self.loaded += 1
+
+        self.done += len(batch)
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+
+    async def run(self, user_ids: Iterable[int]) -> int:
+        """Warms the cache for `user_ids`. Returns the number of profiles cached."""
+        started = time.perf_counter()
+
+        # no point loading more than the cache can hold
+        ids = [str(user_id) for user_id in dict.fromkeys(user_ids) if str(user_id) not in self.cache]
+        ids = ids[: max(0, self.cache.max_size - len(self.cache))]
+
+        self.total = len(ids)
+        limit = asyncio.Semaphore(self.concurrency)
+
+        await asyncio.gather(
+            *(self._load(ids[i : i + self.batch_size], limit) for i in range(0, len(ids), self.batch_size))
+        )
+
+        logger.info(
+            "Warmed %s profiles for %s members in %.1fs",
+            self.loaded,
+            self.total,
+            time.perf_counter() - started,
+            extra={"operation": "warmup"},
+        )
+        return self.loaded
+
+    def start(self, user_ids: Iterable[int]) -> None:
+        """Runs the warm-up in the background. Does nothing if it has already run."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(list(user_ids)))
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
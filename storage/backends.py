@@ -0,0 +1,39 @@
+from typing import Dict, Tuple
+
+from config import get_config_or_throw, settings
+from storage.base import Storage
+
+BACKENDS = ("mongo", "sqlite", "memory")
+
+_opened: Dict[Tuple[str, str], Storage] = {}
+
+
+def open_storage(database_name: str) -> Storage:
+    """
+    The storage for `database_name`, from the backend chosen by `storage.backend`
+    in config.json. Every caller asking for the same database shares one instance.
+    """
+    backend = settings.get_str("storage.backend", "mongo")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+    key = (backend, database_name)
+    if key not in _opened:
+        if backend == "mongo":
+            from database import MongoDB
+
+            _opened[key] = MongoDB(get_config_or_throw("database"), database_name)
+        elif backend == "sqlite":
+            from storage.sqlite import SQLiteStorage
+
+            path = settings.get_str("storage.path", "./{database}.sqlite3")
+            _opened[key] = SQLiteStorage(
+                path.format(database=database_name),
+                busy_timeout=settings.get_float("storage.busy_timeout", 5.0),
+            )
+        else:
+            from storage.memory import MemoryStorage
+
+            _opened[key] = MemoryStorage()
+
+    return _opened[key]
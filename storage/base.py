@@ -0,0 +1,147 @@
+import copy
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Protocol
+
+
+class Storage(Protocol):
+    """
+    What the collection helpers need from a database. `database.MongoDB`,
+    `storage.sqlite.SQLiteStorage` and `storage.memory.MemoryStorage` all
+    provide it, and `database.AsyncMongoDB` wraps any of them.
+
+    Queries and updates use MongoDB's syntax. Backends other than Mongo
+    support the subset the helpers use: equality, `$in`, `$lte`, `$gt` and
+    `$type` filters, and `$set`, `$inc` and `$setOnInsert` updates.
+    The `timestamp` fields the collections write come back as datetimes on
+    every backend (see `storage.sqlite.DATETIME_FIELDS`).
+    """
+
+    def insert_one(self, collection: str, document: Dict[str, Any]) -> Any: ...
+
+    def get_all(self, collection: str, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]: ...
+
+    def find_one(
+        self, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]: ...
+
+    def find_many(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    def delete_one(self, collection: str, query: Dict[str, Any]) -> bool: ...
+
+    def update_one(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> bool: ...
+
+    def update_many(self, collection: str, query: Dict[str, Any], update: Any) -> int: ...
+
+    def find_one_and_update(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]: ...
+
+    def create_index(self, collection: str, keys: str, unique: bool = False) -> str: ...
+
+    def explain(self, collection: str, query: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    def increment_many(
+        self,
+        collection: str,
+        key: str,
+        field: str,
+        deltas: Dict[Any, int],
+        cap: Optional[int] = None,
+        also_set: Optional[Dict[str, Any]] = None,
+    ) -> int: ...
+
+    def close(self) -> None: ...
+
+
+# the `$type` aliases the helpers use, and the python types they match
+TYPES = {
+    "string": (str,),
+    "int": (int,),
+    "double": (float,),
+    "number": (int, float),
+    "date": (datetime,),
+}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Whether `document` matches a query in the supported subset."""
+    for field, condition in query.items():
+        value = document.get(field)
+
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+
+        for operator, operand in condition.items():
+            # like mongo, comparisons only match values of the same kind
+            comparable = value is not None and _is_number(value) == _is_number(operand)
+
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$lte" and not (comparable and value <= operand):
+                return False
+            if operator == "$gt" and not (comparable and value > operand):
+                return False
+            if operator == "$type" and not (
+                isinstance(value, TYPES[operand]) and not isinstance(value, bool)
+            ):
+                return False
+
+    return True
+
+
+def project(document: Optional[Dict[str, Any]], projection: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """A copy of `document` with only the fields `projection` asks for."""
+    if document is None:
+        return None
+    if not projection:
+        return copy.copy(document)
+
+    included = {k for k, v in projection.items() if v}
+    if included:
+        projected = {k: v for k, v in document.items() if k in included}
+        if projection.get("_id", 1) and "_id" in document:
+            projected["_id"] = document["_id"]
+        return projected
+
+    return {k: v for k, v in document.items() if k not in projection}
+
+
+def seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields an upsert copies from its query, i.e. the plain equality matches."""
+    return {k: v for k, v in query.items() if not isinstance(v, dict)}
+
+
+def apply_update(document: Dict[str, Any], update: Any, inserting: bool = False) -> bool:
+    """
+    Applies an update document in place. Returns whether anything changed.
+    Aggregation pipeline updates aren't supported outside of Mongo.
+    """
+    if isinstance(update, list):
+        raise NotImplementedError("pipeline updates are only supported by the MongoDB backend")
+
+    before = dict(document)
+
+    if inserting:
+        document.update(update.get("$setOnInsert", {}))
+    document.update(update.get("$set", {}))
+    for k, v in update.get("$inc", {}).items():
+        document[k] = document.get(k, 0) + v
+
+    return document != before
@@ -0,0 +1,200 @@
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from storage.base import apply_update, matches, project, seed
+
+
+class MemoryStorage:
+    """
+    Storage kept entirely in process memory, for tests, benchmarks and
+    throwaway deployments. Nothing survives a restart.
+
+    Equality lookups on fields with a unique index go through a dict, like an
+    index would. Calls may come from several executor threads, so every
+    operation holds a lock.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, List[Dict[str, Any]]] = {}
+        self._unique: Dict[str, Dict[str, Dict[Any, Dict[str, Any]]]] = {}
+        self._indexed: Dict[str, Set[str]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def _candidates(self, collection: str, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        for field, index in self._unique.get(collection, {}).items():
+            value = query.get(field)
+            if value is not None and not isinstance(value, dict):
+                document = index.get(value)
+                return [document] if document is not None else []
+
+        return self._collections.get(collection, [])
+
+    def _find(self, collection: str, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for document in self._candidates(collection, query):
+            if matches(document, query):
+                return document
+        return None
+
+    def _check_unique(self, collection: str, document: Dict[str, Any], ignore: Optional[Dict[str, Any]] = None) -> None:
+        for field, index in self._unique.get(collection, {}).items():
+            existing = index.get(document.get(field))
+            if field in document and existing is not None and existing is not ignore:
+                raise RuntimeError(f"Duplicate key for {collection}.{field}: {document[field]!r}")
+
+    def _reindex(self, collection: str, document: Dict[str, Any], before: Dict[str, Any]) -> None:
+        for field, index in self._unique.get(collection, {}).items():
+            if before.get(field) != document.get(field):
+                index.pop(before.get(field), None)
+            if field in document:
+                index[document[field]] = document
+
+    def _insert(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        document = {"_id": next(self._ids), **document}
+        self._check_unique(collection, document)
+
+        self._collections.setdefault(collection, []).append(document)
+        self._reindex(collection, document, {})
+        return document
+
+    def insert_one(self, collection: str, document: Dict[str, Any]) -> Any:
+        with self._lock:
+            return self._insert(collection, document)["_id"]
+
+    def get_all(self, collection: str, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [project(document, projection) for document in self._collections.get(collection, [])]
+
+    def find_one(
+        self, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        with self._lock:
+            return project(self._find(collection, query), projection)
+
+    def find_many(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                project(document, projection)
+                for document in self._candidates(collection, query)
+                if matches(document, query)
+            ]
+
+    def delete_one(self, collection: str, query: Dict[str, Any]) -> bool:
+        with self._lock:
+            document = self._find(collection, query)
+            if document is None:
+                return False
+
+            self._collections[collection].remove(document)
+            for field, index in self._unique.get(collection, {}).items():
+                index.pop(document.get(field), None)
+            return True
+
+    def _update(self, collection: str, document: Dict[str, Any], update: Any, inserting: bool = False) -> bool:
+        before = dict(document)
+        try:
+            changed = apply_update(document, update, inserting)
+        except NotImplementedError as e:
+            # the same error the other backends raise for an unsupported update
+            raise RuntimeError(f"Failed to update {collection}: {e}")
+
+        try:
+            self._check_unique(collection, document, ignore=document)
+        except RuntimeError:
+            document.clear()
+            document.update(before)
+            raise
+
+        self._reindex(collection, document, before)
+        return changed
+
+    def update_one(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        with self._lock:
+            document = self._find(collection, query)
+            if document is None:
+                return False
+
+            return self._update(collection, document, {"$set": update})
+
+    def update_many(self, collection: str, query: Dict[str, Any], update: Any) -> int:
+        with self._lock:
+            documents = [d for d in self._candidates(collection, query) if matches(d, query)]
+            return sum(self._update(collection, document, update) for document in documents)
+
+    def find_one_and_update(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            document = self._find(collection, query)
+
+            if document is None:
+                if not upsert:
+                    return None
+
+                document = seed(query)
+                try:
+                    apply_update(document, update, inserting=True)
+                except NotImplementedError as e:
+                    raise RuntimeError(f"Failed to update {collection}: {e}")
+                return project(self._insert(collection, document), projection)
+
+            self._update(collection, document, update)
+            return project(document, projection)
+
+    def increment_many(
+        self,
+        collection: str,
+        key: str,
+        field: str,
+        deltas: Dict[Any, int],
+        cap: Optional[int] = None,
+        also_set: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        with self._lock:
+            modified = 0
+            for value, delta in deltas.items():
+                document = self._find(collection, {key: value})
+                if document is None or not isinstance(document.get(field), (int, float)):
+                    continue
+
+                level = document[field] + delta
+                document[field] = level if cap is None else min(level, cap)
+                document.update(also_set or {})
+                modified += 1
+
+            return modified
+
+    def create_index(self, collection: str, keys: str, unique: bool = False) -> str:
+        with self._lock:
+            self._indexed.setdefault(collection, set()).add(keys)
+
+            if unique:
+                index: Dict[Any, Dict[str, Any]] = {}
+                for document in self._collections.get(collection, []):
+                    if keys in document:
+                        if document[keys] in index:
+                            raise RuntimeError(f"Failed to create index: duplicate {collection}.{keys}")
+                        index[document[keys]] = document
+                self._unique.setdefault(collection, {})[keys] = index
+
+            return f"{keys}_1"
+
+    def explain(self, collection: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        indexed = any(field in query for field in self._indexed.get(collection, set()))
+        stage = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}} if indexed else {"stage": "COLLSCAN"}
+        return {"queryPlanner": {"winningPlan": stage}}
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,385 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from services.metrics import timed_operation
+from storage.base import _is_number, apply_update, project, seed
+
+logger = logging.getLogger(__name__)
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# `$type` aliases and the json_type() values they match
+_JSON_TYPES = {
+    "string": ("text",),
+    "int": ("integer",),
+    "double": ("real",),
+    "number": ("integer", "real"),
+}
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"{name!r} can't be used as a collection or field name")
+    return name
+
+
+def _path(field: str) -> str:
+    return f"json_extract(doc, '$.{_identifier(field)}')"
+
+
+# fields the collections store datetimes in. JSON has no datetime type, so
+# they are written as ISO-8601 strings (which still compare in order) and
+# parsed back on read, like Mongo and the memory backend return them
+DATETIME_FIELDS = frozenset({"timestamp"})
+
+
+def _param(value: Any) -> Any:
+    # documents are stored as JSON, where datetimes are ISO-8601 strings
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode(document: Dict[str, Any]) -> str:
+    return json.dumps({k: v for k, v in document.items() if k != "_id"}, default=_param)
+
+
+def _type_guard(field: str, operand: Any) -> str:
+    # like mongo, comparisons only match values of the same kind
+    kinds = "'integer', 'real'" if _is_number(operand) else "'text'"
+    return f"json_type(doc, '$.{field}') IN ({kinds})"
+
+
+def _where(query: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Translates a query in the supported subset into a WHERE clause and its parameters."""
+    clauses: List[str] = []
+    params: List[Any] = []
+
+    for field, condition in query.items():
+        path = _path(field)
+
+        if not isinstance(condition, dict):
+            if condition is None:
+                clauses.append(f"{path} IS NULL")
+            else:
+                clauses.append(f"{path} = ?")
+                params.append(_param(condition))
+            continue
+
+        for operator, operand in condition.items():
+            if operator == "$in":
+                if not operand:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{path} IN ({', '.join('?' for _ in operand)})")
+                params.extend(_param(value) for value in operand)
+            elif operator in ("$lte", "$gt"):
+                comparison = "<=" if operator == "$lte" else ">"
+                clauses.append(f"{_type_guard(field, operand)} AND {path} {comparison} ?")
+                params.append(_param(operand))
+            elif operator == "$type":
+                kinds = ", ".join(f"'{kind}'" for kind in _JSON_TYPES[operand])
+                clauses.append(f"json_type(doc, '$.{field}') IN ({kinds})")
+            else:
+                raise NotImplementedError(f"{operator} isn't supported by the SQLite backend")
+
+    return (" AND ".join(clauses) or "1"), params
+
+
+class SQLiteStorage:
+    """
+    Embedded storage in a single SQLite file, for deployments that don't want
+    a database server.
+
+    Each collection is a table of JSON documents, and indexes are expression
+    indexes over `json_extract`, so equality and range lookups on indexed
+    fields don't scan the table. The file runs in WAL mode so readers don't
+    block the writer. Each executor thread gets its own connection, and SQL
+    text is kept stable so sqlite3's per-connection statement cache reuses
+    prepared statements.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, cached_statements: int = 256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._tables: Set[str] = set()
+        self._lock = threading.Lock()
+
+        self._connection().execute("PRAGMA journal_mode=WAL")
+        logger.info("Opened SQLite database: %s", path)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+            # WAL only needs a sync at checkpoints, losing the last commit on power loss is fine here
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _table(self, collection: str) -> str:
+        table = _identifier(collection)
+        if table not in self._tables:
+            self._connection().execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" (_id INTEGER PRIMARY KEY AUTOINCREMENT, doc TEXT NOT NULL)'
+            )
+            self._tables.add(table)
+        return table
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        # take the write lock up front, so read-then-write helpers can't interleave
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+
+    @staticmethod
+    def _decode(row: Tuple[int, str]) -> Dict[str, Any]:
+        document = {"_id": row[0], **json.loads(row[1])}
+        for field in DATETIME_FIELDS.intersection(document):
+            if isinstance(document[field], str):
+                try:
+                    document[field] = datetime.fromisoformat(document[field])
+                except ValueError:
+                    pass
+        return document
+
+    def _select(
+        self, connection: sqlite3.Connection, table: str, query: Dict[str, Any], limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        where, params = _where(query)
+        sql = f'SELECT _id, doc FROM "{table}" WHERE {where}'
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        return [self._decode(row) for row in connection.execute(sql, params)]
+
+    def _replace(self, connection: sqlite3.Connection, table: str, document: Dict[str, Any]) -> None:
+        connection.execute(f'UPDATE "{table}" SET doc = ? WHERE _id = ?', (_encode(document), document["_id"]))
+
+    def _run(self, operation: str, collection: str, fn, *args: Any) -> Any:
+        try:
+            return fn(*args)
+        except (sqlite3.Error, NotImplementedError, ValueError) as e:
+            logger.error(
+                "Failed to %s in %s: %s",
+                operation,
+                collection,
+                e,
+                extra={"operation": operation, "collection": collection, "error": str(e)},
+            )
+            raise RuntimeError(f"Failed to {operation}: {e}")
+
+    @timed_operation
+    def insert_one(self, collection: str, document: Dict[str, Any]) -> Any:
+        def insert() -> Any:
+            table = self._table(collection)
+            with self._write() as connection:
+                cursor = connection.execute(f'INSERT INTO "{table}" (doc) VALUES (?)', (_encode(document),))
+                return cursor.lastrowid
+
+        return self._run("insert_one", collection, insert)
+
+    @timed_operation
+    def get_all(self, collection: str, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        def get_all() -> List[Dict[str, Any]]:
+            documents = self._select(self._connection(), self._table(collection), {})
+            return [project(document, projection) for document in documents]
+
+        return self._run("get_all", collection, get_all)
+
+    @timed_operation
+    def find_one(
+        self, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        def find_one() -> Optional[Dict[str, Any]]:
+            documents = self._select(self._connection(), self._table(collection), query, limit=1)
+            return project(documents[0], projection) if documents else None
+
+        return self._run("find_one", collection, find_one)
+
+    @timed_operation
+    def find_many(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        def find_many() -> List[Dict[str, Any]]:
+            documents = self._select(self._connection(), self._table(collection), query)
+            return [project(document, projection) for document in documents]
+
+        return self._run("find_many", collection, find_many)
+
+    @timed_operation
+    def delete_one(self, collection: str, query: Dict[str, Any]) -> bool:
+        def delete_one() -> bool:
+            table = self._table(collection)
+            where, params = _where(query)
+            with self._write() as connection:
+                cursor = connection.execute(
+                    f'DELETE FROM "{table}" WHERE _id = (SELECT _id FROM "{table}" WHERE {where} LIMIT 1)', params
+                )
+                return cursor.rowcount > 0
+
+        return self._run("delete_one", collection, delete_one)
+
+    @timed_operation
+    def update_one(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        def update_one() -> bool:
+            table = self._table(collection)
+            with self._write() as connection:
+                documents = self._select(connection, table, query, limit=1)
+                if not documents or not apply_update(documents[0], {"$set": update}):
+                    return False
+
+                self._replace(connection, table, documents[0])
+                return True
+
+        return self._run("update_one", collection, update_one)
+
+    @timed_operation
+    def update_many(self, collection: str, query: Dict[str, Any], update: Any) -> int:
+        def update_many() -> int:
+            table = self._table(collection)
+            modified = 0
+            with self._write() as connection:
+                for document in self._select(connection, table, query):
+                    if apply_update(document, update):
+                        self._replace(connection, table, document)
+                        modified += 1
+            return modified
+
+        return self._run("update_many", collection, update_many)
+
+    @timed_operation
+    def find_one_and_update(
+        self,
+        collection: str,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        def find_one_and_update() -> Optional[Dict[str, Any]]:
+            table = self._table(collection)
+            with self._write() as connection:
+                documents = self._select(connection, table, query, limit=1)
+
+                if documents:
+                    document = documents[0]
+                    if apply_update(document, update):
+                        self._replace(connection, table, document)
+                    return project(document, projection)
+
+                if not upsert:
+                    return None
+
+                document = seed(query)
+                apply_update(document, update, inserting=True)
+                cursor = connection.execute(f'INSERT INTO "{table}" (doc) VALUES (?)', (_encode(document),))
+                return project({"_id": cursor.lastrowid, **document}, projection)
+
+        return self._run("find_one_and_update", collection, find_one_and_update)
+
+    @timed_operation
+    def create_index(self, collection: str, keys: str, unique: bool = False) -> str:
+        def create_index() -> str:
+            table = self._table(collection)
+            name = f"{table}_{_identifier(keys)}"
+            self._connection().execute(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" ON "{table}" ({_path(keys)})'
+            )
+            return name
+
+        return self._run("create_index", collection, create_index)
+
+    @timed_operation
+    def explain(self, collection: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """The query plan, in the shape `MongoDB.explain` returns so the index checks work on either."""
+
+        def explain() -> Dict[str, Any]:
+            table = self._table(collection)
+            where, params = _where(query)
+            plan = self._connection().execute(
+                f'EXPLAIN QUERY PLAN SELECT _id, doc FROM "{table}" WHERE {where}', params
+            ).fetchall()
+
+            scans = any(row[-1].startswith("SCAN") for row in plan)
+            stage = {"stage": "COLLSCAN"} if scans else {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+            return {"queryPlanner": {"winningPlan": stage}, "sqlite": [row[-1] for row in plan]}
+
+        return self._run("explain", collection, explain)
+
+    @timed_operation
+    def increment_many(
+        self,
+        collection: str,
+        key: str,
+        field: str,
+        deltas: Dict[Any, int],
+        cap: Optional[int] = None,
+        also_set: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """Adds a per-document delta to a numeric field with one prepared statement, in one transaction."""
+
+        def increment_many() -> int:
+            if not deltas:
+                return 0
+
+            table = self._table(collection)
+            also_set_fields = list((also_set or {}).items())
+
+            value = f"{_path(field)} + ?"
+            if cap is not None:
+                value = f"MIN({value}, ?)"
+
+            assignments = ", ".join(
+                [f"'$.{_identifier(field)}', {value}"] + [f"'$.{_identifier(k)}', ?" for k, _ in also_set_fields]
+            )
+            sql = (
+                f'UPDATE "{table}" SET doc = json_set(doc, {assignments}) '
+                f"WHERE {_path(key)} = ? AND json_type(doc, '$.{field}') IN ('integer', 'real')"
+            )
+
+            rows = []
+            for match, delta in deltas.items():
+                params: List[Any] = [delta] + ([cap] if cap is not None else [])
+                params += [_param(v) for _, v in also_set_fields]
+                rows.append(params + [_param(match)])
+
+            with self._write() as connection:
+                return connection.executemany(sql, rows).rowcount
+
+        return self._run("increment_many", collection, increment_many)
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()